@@ -0,0 +1,68 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .classical_models.ngram_engine import tokenize, chrf_units, ReferenceNgrams
+from .classical_models.tfidf import tfidf_terms
+from .topic_models.LDA import preprocess
+
+
+PROFILE_CACHE_SIZE = int(os.getenv("BENCHMARK_PROFILE_CACHE_SIZE", "64"))
+
+
+class BenchmarkProfile:
+    """
+    Reference side of every classical comparison, built once per benchmark:
+      - tokens / token_ngrams (1-4): BLEU and ROUGE, integer-encoded
+      - char_ngrams (1-6): ChrF, integer-encoded
+      - tfidf_terms: TF-IDF term counts
+      - tfidf_rows: benchmark row per pre-fitted vectorizer (batch mode)
+      - lda_tokens: LDA preprocessing
+      - lda_topic_dists: benchmark topic distributions per corpus LDA model
+      - embeddings: benchmark embeddings per embedding model (SBERT, ...)
+    """
+
+    def __init__(self, benchmark_id: str, benchmark_text: str, max_token_n: int = 4, max_char_n: int = 6):
+        self.benchmark_id = benchmark_id
+        self.text = benchmark_text
+        self.text_hash = text_hash(benchmark_text)
+
+        self.tokens = tokenize(benchmark_text)
+        self.token_ngrams = ReferenceNgrams(self.tokens, max_token_n)
+        self.char_ngrams = ReferenceNgrams(chrf_units(benchmark_text), max_char_n)
+        self.tfidf_terms = tfidf_terms(benchmark_text)
+        self.tfidf_rows = {}
+        self.lda_tokens = preprocess(benchmark_text)
+        self.lda_topic_dists = {}
+        self.embeddings = {}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# benchmark_id -> BenchmarkProfile, least recently used first
+_profiles: "OrderedDict[str, BenchmarkProfile]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def get_benchmark_profile(benchmark_id: str, benchmark_text: str) -> BenchmarkProfile:
+    """
+    Cached profile for a benchmark. A changed text under the same
+    benchmark_id rebuilds the profile.
+    """
+    with _profiles_lock:
+        profile = _profiles.get(benchmark_id)
+        if profile is not None and profile.text_hash == text_hash(benchmark_text):
+            _profiles.move_to_end(benchmark_id)
+            return profile
+
+    profile = BenchmarkProfile(benchmark_id, benchmark_text)
+
+    with _profiles_lock:
+        _profiles[benchmark_id] = profile
+        _profiles.move_to_end(benchmark_id)
+        while len(_profiles) > PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
+    return profile
@@ -1,27 +1,26 @@
 import time
-from collections import Counter
 
+from .ngram_engine import chrf_units, ReferenceNgrams
 
-def char_ngrams(text: str, n: int):
-    # character n-grams
-    text = text.replace(" ", "_")  # preserve word boundaries
-    return [text[i:i+n] for i in range(len(text)-n+1)]
 
+def reference_char_ngrams(reference: str, n_max: int, profile=None) -> ReferenceNgrams:
+    # reference character n-grams, from the benchmark profile when it covers n_max
+    if profile is not None and profile.char_ngrams.max_n >= n_max:
+        return profile.char_ngrams
+    return ReferenceNgrams(chrf_units(reference), n_max)
 
-def chrf_score(candidate: str, reference: str, n_max: int = 6, beta: float = 2.0) -> float:
-    # chrf score
-    cand_ngrams = []
-    ref_ngrams = []
-    for n in range(1, n_max+1):
-        cand_ngrams.extend(char_ngrams(candidate, n))
-        ref_ngrams.extend(char_ngrams(reference, n))
 
-    cand_counts = Counter(cand_ngrams)
-    ref_counts = Counter(ref_ngrams)
+def chrf_score(candidate: str, reference: str, n_max: int = 6, beta: float = 2.0, profile=None) -> float:
+    # chrf score over packed integer char n-grams; n-grams of different
+    # lengths never match, so overlap and totals are summed per n
+    ref = reference_char_ngrams(reference, n_max, profile)
 
-    overlap = sum((cand_counts & ref_counts).values())
-    total_cand = sum(cand_counts.values())
-    total_ref = sum(ref_counts.values())
+    overlap = 0
+    total_cand = 0
+    for n, n_overlap, n_total in ref.overlaps(chrf_units(candidate), n_max):
+        overlap += n_overlap
+        total_cand += n_total
+    total_ref = sum(ref.totals[n] for n in range(1, n_max+1))
 
     # Precision and recall
     p = overlap / total_cand if total_cand > 0 else 0.0
@@ -35,9 +34,9 @@ def chrf_score(candidate: str, reference: str, n_max: int = 6, beta: float = 2.0
     return f_beta
 
 
-def get_chrf(candidate: str, reference: str) -> dict:
+def get_chrf(candidate: str, reference: str, profile=None) -> dict:
     # character f-score
     start = time.time()
-    score = chrf_score(candidate, reference)
+    score = chrf_score(candidate, reference, profile=profile)
     elapsed = time.time() - start
     return {"ChrF": score, "elapsed_time_sec": elapsed}
@@ -1,50 +1,56 @@
 import time
-from collections import Counter
 
+from .ngram_engine import tokenize
+from .BLEU import reference_ngrams
 
-def tokenize(text: str):
-    # splits on whitespace
-    return text.strip().split()
 
-
-def ngrams(tokens, n: int):
-    # n-grams from tokens
-    return [tuple(tokens[i:i+n]) for i in range(len(tokens)-n+1)]
-
-
-def rouge_n(candidate: str, reference: str, n: int = 1) -> float:
-    cand_tokens = tokenize(candidate)
-    ref_tokens = tokenize(reference)
-
-    cand_ngrams = Counter(ngrams(cand_tokens, n))
-    ref_ngrams = Counter(ngrams(ref_tokens, n))
-
-    overlap = sum((cand_ngrams & ref_ngrams).values())
-    total_ref = max(sum(ref_ngrams.values()), 1)
+def rouge_n(candidate: str, reference: str, n: int = 1, profile=None) -> float:
+    ref = reference_ngrams(reference, n, profile)
+    overlap = {m: o for m, o, _ in ref.overlaps(tokenize(candidate), n)}[n]
+    total_ref = max(ref.totals[n], 1)
 
     return overlap / total_ref
 
 
 def lcs_length(x, y):
-    # lcs with dp
-    m, n = len(x), len(y)
-    dp = [[0] * (n + 1) for _ in range(m + 1)]
-    for i in range(m):
-        for j in range(n):
-            if x[i] == y[j]:
-                dp[i+1][j+1] = dp[i][j] + 1
-            else:
-                dp[i+1][j+1] = max(dp[i][j+1], dp[i+1][j])
-    return dp[m][n]
-
-
-def rouge_l(candidate: str, reference: str) -> dict:
-    cand_tokens = tokenize(candidate)
-    ref_tokens = tokenize(reference)
-
-    lcs = lcs_length(cand_tokens, ref_tokens)
-    r_lcs = lcs / len(ref_tokens) if ref_tokens else 0.0
-    p_lcs = lcs / len(cand_tokens) if cand_tokens else 0.0
+    """
+    lcs length, bit-parallel (Allison-Dix / Hyyro).
+    Bit j of `v` tracks position j of the shorter sequence; each token of the
+    longer one updates all positions at once with big-int arithmetic.
+    O(len(x) * len(y) / wordsize) time and O(len(y)) memory instead of a full dp table.
+    """
+    if len(x) < len(y):
+        x, y = y, x
+    if not y:
+        return 0
+
+    # match mask per token: bit j set where y[j] == token
+    match = {}
+    for j, tok in enumerate(y):
+        match[tok] = match.get(tok, 0) | (1 << j)
+
+    mask = (1 << len(y)) - 1
+    v = mask
+    for tok in x:
+        m = match.get(tok)
+        if m is None:
+            continue  # no match: v is unchanged
+        u = v & m
+        v = ((v + u) | (v - u)) & mask
+
+    # every cleared bit is one matched position
+    return len(y) - bin(v).count("1")
+
+
+def rouge_l(candidate: str, reference: str, profile=None) -> dict:
+    # lcs over integer-encoded tokens (unseen candidate tokens encode to 0 and never match)
+    ref = reference_ngrams(reference, 1, profile)
+    cand_ids = ref.encode(tokenize(candidate)).tolist()
+    ref_ids = ref.ids.tolist()
+
+    lcs = lcs_length(cand_ids, ref_ids)
+    r_lcs = lcs / len(ref_ids) if ref_ids else 0.0
+    p_lcs = lcs / len(cand_ids) if cand_ids else 0.0
 
     beta = 1.2  # recall-focused
     if r_lcs > 0 and p_lcs > 0:
@@ -55,13 +61,16 @@ def rouge_l(candidate: str, reference: str) -> dict:
     return {"recall": r_lcs, "precision": p_lcs, "f1": f_lcs}
 
 
-def get_rouge(candidate: str, reference: str) -> dict:
-    # rouge scores
+def get_rouge(candidate: str, reference: str, profile=None) -> dict:
+    # rouge scores; profile (BenchmarkProfile) supplies the reference side
     start = time.time()
 
-    r1 = rouge_n(candidate, reference, n=1)
-    r2 = rouge_n(candidate, reference, n=2)
-    rl = rouge_l(candidate, reference)
+    # ROUGE-1 and ROUGE-2 from one encoding of the candidate
+    ref = reference_ngrams(reference, 2, profile)
+    overlaps = {n: o for n, o, _ in ref.overlaps(tokenize(candidate), 2)}
+    r1 = overlaps[1] / max(ref.totals[1], 1)
+    r2 = overlaps[2] / max(ref.totals[2], 1)
+    rl = rouge_l(candidate, reference, profile=profile)
 
     elapsed = time.time() - start
     return {
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+def tokenize(text: str):
+    # splits on whitespace
+    return text.strip().split()
+
+
+def chrf_units(text: str):
+    # characters for ChrF, with spaces marked to preserve word boundaries
+    return list(text.replace(" ", "_"))
+
+
+def pack_ngrams(ids: np.ndarray, base: int, max_n: int):
+    """
+    Yield (n, keys) for n = 1..max_n, where each n-gram of ids is packed into
+    one integer key = sum(ids[i + k] * base**k). Exact (no collisions) as long
+    as every id < base. Falls back to Python ints when base**max_n overflows int64.
+    """
+    if base ** max_n >= 2 ** 63:
+        ids = ids.astype(object)
+
+    keys = ids
+    for n in range(1, max_n + 1):
+        if n > 1:
+            keys = keys[:-1] + ids[n - 1:] * (base ** (n - 1))
+        yield n, keys
+
+
+class ReferenceNgrams:
+    """
+    Integer-encoded n-gram counts of a reference sequence (tokens or characters).
+
+    Units are interned to ids 1..V; candidate units unseen in the reference map
+    to 0, and since no reference key contains a 0 digit, those n-grams can never
+    match. Per n, the reference keeps sorted unique keys and their counts, so a
+    candidate overlap is one np.unique plus one sorted-array intersection.
+    """
+
+    def __init__(self, units, max_n: int):
+        self.vocab = {}
+        for unit in units:
+            if unit not in self.vocab:
+                self.vocab[unit] = len(self.vocab) + 1
+        self.base = len(self.vocab) + 1
+        self.max_n = max_n
+        self.ids = self.encode(units)
+
+        self.keys = {}
+        self.counts = {}
+        self.totals = {}
+        for n, keys in pack_ngrams(self.ids, self.base, max_n):
+            self.keys[n], self.counts[n] = np.unique(keys, return_counts=True)
+            self.totals[n] = len(keys)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def encode(self, units) -> np.ndarray:
+        return np.fromiter((self.vocab.get(u, 0) for u in units), dtype=np.int64, count=len(units))
+
+    def overlaps(self, units, max_n: int = None):
+        """
+        Yield (n, clipped overlap, candidate n-gram total) for n = 1..max_n,
+        i.e. sum(min(count_cand, count_ref)) over shared n-grams.
+        """
+        max_n = min(max_n or self.max_n, self.max_n)
+        cand_ids = self.encode(units)
+        for n, keys in pack_ngrams(cand_ids, self.base, max_n):
+            if len(keys) == 0 or len(self.keys[n]) == 0:
+                yield n, 0, len(keys)
+                continue
+            cand_keys, cand_counts = np.unique(keys, return_counts=True)
+            _, ci, ri = np.intersect1d(cand_keys, self.keys[n], assume_unique=True, return_indices=True)
+            overlap = int(np.minimum(cand_counts[ci], self.counts[n][ri]).sum())
+            yield n, overlap, len(keys)
@@ -1,22 +1,120 @@
+import os
+import math
 import time
+from collections import Counter
+from typing import List
+import joblib
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
 
-def get_tfidf_cosine(benchmark: str, student: str) -> dict:
-    # tfidf cosine similarity
+# "pair": per-pair fit (default, original numbers); "batch": one fit/transform per request
+TFIDF_MODE = os.getenv("TFIDF_MODE", "pair")
+# optional pre-fitted TfidfVectorizer (joblib dump) with the course vocabulary/IDF
+TFIDF_VECTORIZER_PATH = os.getenv("TFIDF_VECTORIZER_PATH", "")
+
+# same tokenization/lowercasing as a default TfidfVectorizer
+_analyzer = TfidfVectorizer().build_analyzer()
+
+_fitted_vectorizer = None
+
+
+def tfidf_terms(text: str) -> Counter:
+    # raw term counts as TfidfVectorizer would see them
+    return Counter(_analyzer(text))
+
+
+def pair_tfidf_cosine(benchmark_terms: Counter, student_terms: Counter) -> float:
+    # cosine of the two rows TfidfVectorizer would produce when fitted on just
+    # these two documents: raw tf, smooth idf = ln(3 / (1 + df)) + 1, l2 norm
+    idf_shared = math.log(3 / 3) + 1
+    idf_single = math.log(3 / 2) + 1
+
+    def norm(terms, other):
+        return math.sqrt(sum(
+            (tf * (idf_shared if t in other else idf_single)) ** 2 for t, tf in terms.items()
+        ))
+
+    dot = sum(tf * student_terms[t] * idf_shared ** 2 for t, tf in benchmark_terms.items() if t in student_terms)
+    denom = norm(benchmark_terms, student_terms) * norm(student_terms, benchmark_terms)
+    return dot / denom if denom > 0 else 0.0
+
+
+def get_tfidf_cosine(benchmark: str, student: str, profile=None) -> dict:
+    # tfidf cosine similarity; profile (BenchmarkProfile) supplies the benchmark term counts
     start = time.time()
 
-    vectorizer = TfidfVectorizer()
-    tfidf = vectorizer.fit_transform([benchmark, student])  # 2 x |V| matrix
+    if profile is not None:
+        student_terms = tfidf_terms(student)
+        vocab_size = len(profile.tfidf_terms.keys() | student_terms.keys())
+        if vocab_size == 0:
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        sim = pair_tfidf_cosine(profile.tfidf_terms, student_terms)
+    else:
+        vectorizer = TfidfVectorizer()
+        tfidf = vectorizer.fit_transform([benchmark, student])  # 2 x |V| matrix
 
-    # Compute cosine similarity between the two rows
-    sim = cosine_similarity(tfidf[0], tfidf[1])[0, 0]
+        # Compute cosine similarity between the two rows
+        sim = cosine_similarity(tfidf[0], tfidf[1])[0, 0]
+        vocab_size = len(vectorizer.get_feature_names_out())
 
     elapsed = time.time() - start
     return {
         "tfidf_cosine_similarity": float(sim),
-        "vocab_size": len(vectorizer.get_feature_names_out()),
+        "vocab_size": vocab_size,
         "elapsed_time_sec": elapsed,
     }
 
+
+def load_fitted_vectorizer(path: str = TFIDF_VECTORIZER_PATH):
+    # load the pre-fitted course vectorizer used by the batch mode, if configured
+    global _fitted_vectorizer
+    if not path:
+        return None
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"TF-IDF vectorizer not found: {path}")
+    _fitted_vectorizer = joblib.load(path)
+    return _fitted_vectorizer
+
+
+def get_tfidf_cosine_batch(benchmark: str, students: List[str], profile=None) -> List[dict]:
+    """
+    Batch mode: one vectorizer for the benchmark and all student texts, and all
+    similarities from one sparse mat-vec. Uses the pre-fitted course vectorizer
+    when loaded, otherwise fits on [benchmark] + students.
+    Returns one dict per student text, same shape as get_tfidf_cosine.
+    """
+    start = time.time()
+    if not students:
+        return []
+
+    vectorizer = _fitted_vectorizer
+    if vectorizer is not None:
+        student_matrix = vectorizer.transform(students)
+        bench_row = profile.tfidf_rows.get(id(vectorizer)) if profile is not None else None
+        if bench_row is None:
+            bench_row = vectorizer.transform([benchmark])
+            if profile is not None:
+                profile.tfidf_rows[id(vectorizer)] = bench_row
+    else:
+        vectorizer = TfidfVectorizer()
+        matrix = vectorizer.fit_transform([benchmark] + students)
+        bench_row = matrix[0]
+        student_matrix = matrix[1:]
+
+    if getattr(vectorizer, "norm", None) == "l2":
+        # rows are unit length, so cosine is a plain dot product
+        sims = (student_matrix @ bench_row.T).toarray().ravel()
+    else:
+        sims = cosine_similarity(student_matrix, bench_row).ravel()
+
+    vocab_size = len(vectorizer.vocabulary_)
+    elapsed = (time.time() - start) / len(students)
+    return [
+        {
+            "tfidf_cosine_similarity": float(sim),
+            "vocab_size": vocab_size,
+            "elapsed_time_sec": elapsed,
+        }
+        for sim in sims
+    ]
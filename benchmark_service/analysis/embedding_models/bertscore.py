@@ -1,18 +1,159 @@
+import os
 import time
-from bert_score import score
+import threading
+from typing import List, Tuple
 
+import numpy as np
 
-def get_bertscore(candidate: str, reference: str) -> dict:
-    """calculate BERT scoree"""
+from .onnx_backend import check_backend
+
+
+# off by default: needs transformers and torch (or the onnx backend)
+BERTSCORE_ENABLED = os.getenv("BERTSCORE_ENABLED", "0") == "1"
+# multilingual default (covers Norwegian); NbAiLab/nb-bert-base is a Norwegian BERT alternative
+model_name = os.getenv("BERTSCORE_MODEL_NAME", "bert-base-multilingual-cased")
+# token embeddings come from this layer (bert_score's choice for mBERT is 9)
+BERTSCORE_NUM_LAYERS = int(os.getenv("BERTSCORE_NUM_LAYERS", "9"))
+# texts per forward pass
+BERTSCORE_BATCH_SIZE = int(os.getenv("BERTSCORE_BATCH_SIZE", "32"))
+# "torch" (transformers) or "onnx" (exported, int8-quantized, see onnx_backend)
+BERTSCORE_BACKEND = check_backend("BERTSCORE_BACKEND", os.getenv("BERTSCORE_BACKEND", "torch"))
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+class BertScorer:
+    """
+    Resident BERTScore model: token embeddings from the first num_layers
+    layers, greedy cosine matching as in bert_score (idf off, special tokens
+    can be matched but carry no weight). Candidates are scored a padded
+    batch at a time against one cached reference.
+    """
+
+    def __init__(self, name: str = model_name, num_layers: int = BERTSCORE_NUM_LAYERS, backend: str = BERTSCORE_BACKEND):
+        self.name = name
+        self.num_layers = num_layers
+        self.backend = backend
+        if backend == "onnx":
+            from .onnx_backend import OnnxTokenEncoder
+            self.encoder = OnnxTokenEncoder(name, num_layers=num_layers)
+            self.tokenizer = self.encoder.tokenizer
+            self.max_length = self.encoder.max_length
+        else:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(name)
+            self.model = AutoModel.from_pretrained(name)
+            # same truncation bert_score applies: the last kept layer is the output
+            self.model.encoder.layer = self.model.encoder.layer[:num_layers]
+            self.model.eval()
+            self.max_length = min(self.tokenizer.model_max_length, 512)
+            self._torch = torch
+        self.special_ids = np.array(self.tokenizer.all_special_ids)
+
+    def embed(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        One padded batch: unit-length token embeddings [batch, tokens, dim],
+        the attention mask and the weight mask (real, non-special tokens).
+        """
+        texts = [t.strip() for t in texts]
+        if self.backend == "onnx":
+            hidden, attention, input_ids = self.encoder.embed(texts)
+        else:
+            encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+            with self._torch.no_grad():
+                hidden = self.model(**encoded)[0].numpy()
+            attention, input_ids = encoded["attention_mask"].numpy(), encoded["input_ids"].numpy()
+        hidden = hidden / np.clip(np.linalg.norm(hidden, axis=-1, keepdims=True), 1e-12, None)
+        attention = attention.astype(bool)
+        weights = attention & ~np.isin(input_ids, self.special_ids)
+        return hidden.astype(np.float32), attention, weights
+
+    def reference(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        # reference token embeddings [tokens, dim] and their weight mask
+        hidden, attention, weights = self.embed([text])
+        length = attention[0].sum()
+        return hidden[0, :length], weights[0, :length]
+
+    def score(self, reference: Tuple[np.ndarray, np.ndarray], texts: List[str],
+              batch_size: int = BERTSCORE_BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Precision, recall and F1 of every candidate against the reference.
+        Candidates are sorted by length so each padded batch stays tight.
+        """
+        ref_emb, ref_weights = reference
+        precision = np.zeros(len(texts), dtype=np.float32)
+        recall = np.zeros(len(texts), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            hidden, attention, weights = self.embed([texts[i] for i in batch])
+            sim = hidden @ ref_emb.T  # [batch, tokens, ref tokens]
+
+            # precision: best reference match per candidate token, averaged over weighted tokens
+            token_precision = sim.max(axis=2)
+            counts = weights.sum(axis=1)
+            precision[batch] = np.where(counts > 0, (token_precision * weights).sum(axis=1) / np.maximum(counts, 1), 0.0)
+
+            # recall: best candidate match per reference token; padding never matches
+            sim = np.where(attention[:, :, None], sim, -np.inf)
+            token_recall = sim.max(axis=1)
+            ref_count = ref_weights.sum()
+            if ref_count:
+                recall[batch] = np.where(counts > 0, (token_recall * ref_weights).sum(axis=1) / ref_count, 0.0)
+
+        denom = precision + recall
+        f1 = np.where(denom > 0, 2 * precision * recall / np.where(denom > 0, denom, 1), 0.0)
+        return precision, recall, f1
+
+
+def get_bertscore_model() -> BertScorer:
+    """load the scorer once; called at startup when BERTSCORE_ENABLED is set."""
+    global _scorer
+    with _scorer_lock:
+        if _scorer is None:
+            _scorer = BertScorer()
+    return _scorer
+
+
+def get_reference(benchmark: str, profile=None):
+    # reference embeddings cached per benchmark_id through the profile
+    scorer = get_bertscore_model()
+    if profile is None:
+        return scorer.reference(benchmark)
+    key = ("bertscore", scorer.name, scorer.num_layers, scorer.backend)
+    reference = profile.embeddings.get(key)
+    if reference is None:
+        reference = scorer.reference(benchmark)
+        profile.embeddings[key] = reference
+    return reference
+
+
+def get_bertscore_batch(candidates: List[str], reference: str, profile=None) -> List[dict]:
+    """
+    BERTScore P/R/F1 for every candidate text of a request against the
+    benchmark, in one batched pass. Returns one dict per candidate.
+    """
     start = time.time()
-    
-    P, R, F1 = score([candidate], [reference], lang='en', verbose=False)
-    
-    elapsed = time.time() - start
-    
-    return {
-        "bertscore_precision": P.item(),
-        "bertscore_recall": R.item(), 
-        "bertscore_f1": F1.item(),
-        "elapsed_time_sec": elapsed,
-    }
\ No newline at end of file
+    if not candidates:
+        return []
+
+    P, R, F1 = get_bertscore_model().score(get_reference(reference, profile), candidates)
+
+    elapsed = (time.time() - start) / len(candidates)
+    return [
+        {
+            "bertscore_precision": float(p),
+            "bertscore_recall": float(r),
+            "bertscore_f1": float(f),
+            "elapsed_time_sec": elapsed,
+        }
+        for p, r, f in zip(P, R, F1)
+    ]
+
+
+def get_bertscore(candidate: str, reference: str, profile=None) -> dict:
+    """calculate BERT scoree"""
+    return get_bertscore_batch([candidate], reference, profile=profile)[0]
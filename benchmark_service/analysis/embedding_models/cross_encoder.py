@@ -1,31 +1,143 @@
+import os
+import re
 import time
-from sentence_transformers import CrossEncoder
+import threading
+from typing import List
 
+import numpy as np
+
+from .onnx_backend import check_backend
+from .sbert import simple_sent_split
+
+
+# off by default: needs sentence-transformers (or the onnx backend)
+CROSSENCODER_ENABLED = os.getenv("CROSSENCODER_ENABLED", "0") == "1"
+model_name = os.getenv("CROSSENCODER_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# "torch" (sentence-transformers) or "onnx" (exported, int8-quantized, see onnx_backend)
+CROSSENCODER_BACKEND = check_backend("CROSSENCODER_BACKEND", os.getenv("CROSSENCODER_BACKEND", "torch"))
+# "document": one (benchmark, essay) pair per essay, truncated at the model's max length
+# "sentences": student sentences against their top-k lexically closest benchmark sentences
+CROSSENCODER_MODE = os.getenv("CROSSENCODER_MODE", "document")
+# pairs per forward pass inside one predict call
+CROSSENCODER_BATCH_SIZE = int(os.getenv("CROSSENCODER_BATCH_SIZE", "64"))
+# sentence mode: candidate benchmark sentences per student sentence, and a cap on pairs per essay
+CROSSENCODER_TOP_K = int(os.getenv("CROSSENCODER_TOP_K", "3"))
+CROSSENCODER_MAX_PAIRS = int(os.getenv("CROSSENCODER_MAX_PAIRS", "256"))
+
+if CROSSENCODER_MODE not in ("document", "sentences"):
+    raise ValueError(f"CROSSENCODER_MODE must be 'document' or 'sentences', got '{CROSSENCODER_MODE}'")
 
-# Global model - will be loaded once when module is imported
-model_name = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 _cross_encoder_model = None
+_cross_encoder_lock = threading.Lock()
+
+_word_pattern = re.compile(r"\w+")
 
 
 def get_crossencoder_model():
-    """reuse cross encoder model."""
+    """reuse cross encoder model; called at startup when CROSSENCODER_ENABLED is set."""
     global _cross_encoder_model
-    if _cross_encoder_model is None:
-        _cross_encoder_model = CrossEncoder(model_name)
+    with _cross_encoder_lock:
+        if _cross_encoder_model is None and CROSSENCODER_BACKEND == "onnx":
+            from .onnx_backend import OnnxCrossEncoder
+            _cross_encoder_model = OnnxCrossEncoder(model_name)
+        elif _cross_encoder_model is None:
+            from sentence_transformers import CrossEncoder
+            _cross_encoder_model = CrossEncoder(model_name)
     return _cross_encoder_model
 
 
-def get_crossencoder_score(benchmark: str, text: str) -> dict:
-    """calculate cross encoder score benchmark and text."""
+def predict(pairs: List[tuple]) -> np.ndarray:
+    # one batched predict call for every pair of the request
+    if not pairs:
+        return np.zeros(0, dtype=np.float32)
+    return np.asarray(get_crossencoder_model().predict(
+        pairs, batch_size=CROSSENCODER_BATCH_SIZE, show_progress_bar=False
+    ), dtype=np.float32)
+
+
+def _words(sentence: str) -> set:
+    return set(_word_pattern.findall(sentence.lower()))
+
+
+def candidate_pairs(bench_words: List[set], stud_words: List[set], top_k: int = CROSSENCODER_TOP_K,
+                    max_pairs: int = CROSSENCODER_MAX_PAIRS) -> List[tuple]:
+    """
+    Cheap lexical prefilter for the sentence mode: for each student sentence
+    the top_k benchmark sentences by word overlap (Jaccard), so pairs grow
+    linearly with essay length. Essays above max_pairs keep every sentence's
+    best candidate first, then second best, and so on.
+    Returns (benchmark index, student index) pairs.
+    """
+    scored = []
+    for j, words in enumerate(stud_words):
+        overlaps = [
+            (len(words & bench) / len(words | bench) if words or bench else 0.0, i)
+            for i, bench in enumerate(bench_words)
+        ]
+        # highest overlap first, earlier benchmark sentence on ties
+        overlaps.sort(key=lambda item: (-item[0], item[1]))
+        scored.extend((rank, -overlap, i, j) for rank, (overlap, i) in enumerate(overlaps[:top_k]))
+    if len(scored) > max_pairs:
+        scored = sorted(scored)[:max_pairs]
+    return [(i, j) for _, _, i, j in scored]
+
+
+def get_crossencoder_scores_batch(benchmark: str, texts: List[str]) -> List[dict]:
+    """
+    cross encoder scores for every text of a request from one predict call.
+    Document mode: crossencoder_score of the (benchmark, essay) pair.
+    Sentence mode: crossencoder_score is the mean best score per student
+    sentence (alignment), plus the mean best score per benchmark sentence
+    (coverage, 0 for sentences without a candidate).
+    """
     start = time.time()
-    cross_encoder = get_crossencoder_model()
+    if not texts:
+        return []
+
+    if CROSSENCODER_MODE == "document":
+        scores = predict([(benchmark, text) for text in texts])
+        elapsed = (time.time() - start) / len(texts)
+        return [{"crossencoder_score": float(score), "elapsed_time_sec": elapsed} for score in scores]
+
+    bench_sents = simple_sent_split(benchmark)
+    bench_words = [_words(s) for s in bench_sents]
 
-    # Model expects list of pairs
-    score = cross_encoder.predict([(benchmark, text)]).item()
+    # candidate pairs of all essays, scored together
+    pairs, owners = [], []
+    for k, text in enumerate(texts):
+        stud_sents = simple_sent_split(text)
+        for i, j in candidate_pairs(bench_words, [_words(s) for s in stud_sents]):
+            pairs.append((bench_sents[i], stud_sents[j]))
+            owners.append((k, i, j))
+    scores = predict(pairs)
 
-    elapsed = time.time() - start
+    best_student = [dict() for _ in texts]
+    best_bench = [dict() for _ in texts]
+    n_pairs = [0] * len(texts)
+    for (k, i, j), score in zip(owners, scores):
+        best_student[k][j] = max(best_student[k].get(j, score), score)
+        best_bench[k][i] = max(best_bench[k].get(i, score), score)
+        n_pairs[k] += 1
 
-    return {
-        "crossencoder_score": score,
-        "elapsed_time_sec": elapsed,
-    }
+    elapsed = (time.time() - start) / len(texts)
+    results = []
+    for k in range(len(texts)):
+        alignment = None
+        if best_student[k]:
+            alignment = float(np.mean(list(best_student[k].values())))
+        coverage = None
+        if bench_sents and best_bench[k]:
+            coverage = float(sum(best_bench[k].values()) / len(bench_sents))
+        results.append({
+            "crossencoder_score": alignment,
+            "crossencoder_benchmark_coverage": coverage,
+            "n_pairs": n_pairs[k],
+            "n_student_sentences_scored": len(best_student[k]),
+            "elapsed_time_sec": elapsed,
+        })
+    return results
+
+
+def get_crossencoder_score(benchmark: str, text: str) -> dict:
+    """calculate cross encoder score benchmark and text."""
+    return get_crossencoder_scores_batch(benchmark, [text])[0]
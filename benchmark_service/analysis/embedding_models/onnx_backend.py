@@ -0,0 +1,209 @@
+import os
+import re
+import shutil
+import argparse
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# exported models are cached here, one directory per model/kind
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "data/onnx_models")
+# dynamic int8 quantization target: avx2, avx512, avx512_vnni, arm64, or none to keep fp32
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+# intra-op threads per session; 0 lets onnxruntime use every core
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))
+
+BACKENDS = ("torch", "onnx")
+
+# what a model is exported for
+SENTENCE = "sentence"            # mean-pooled sentence embeddings (SBERT)
+CROSS_ENCODER = "cross_encoder"  # sequence classification logits for text pairs
+TOKEN = "token"                  # contextual token embeddings (BERTScore)
+
+_export_lock = threading.Lock()
+
+
+def check_backend(name: str, backend: str) -> str:
+    # validate a per-model backend flag, e.g. SBERT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"{name} must be one of {BACKENDS}, got '{backend}'")
+    return backend
+
+
+def model_dir(model_name: str, kind: str, num_layers: Optional[int] = None, model_root: str = ONNX_MODEL_DIR) -> str:
+    # e.g. data/onnx_models/sentence-transformers__paraphrase-multilingual-MiniLM-L12-v2/sentence-avx2
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name.replace("/", "__"))
+    variant = kind if num_layers is None else f"{kind}-L{num_layers}"
+    return os.path.join(model_root, safe_name, f"{variant}-{ONNX_QUANTIZATION}")
+
+
+def _onnx_file(path: str) -> str:
+    return os.path.join(path, "model.onnx" if ONNX_QUANTIZATION == "none" else "model_quantized.onnx")
+
+
+def export_model(model_name: str, kind: str, num_layers: Optional[int] = None, model_root: str = ONNX_MODEL_DIR) -> str:
+    """
+    Export a Hugging Face model to ONNX and quantize it (dynamic int8),
+    unless the cache already has it. Returns the model directory, which
+    also holds the tokenizer. Needs optimum[onnxruntime] and torch; loading
+    an already exported model only needs onnxruntime and transformers.
+    For TOKEN models only the first num_layers encoder layers are kept.
+    """
+    path = model_dir(model_name, kind, num_layers, model_root)
+    with _export_lock:
+        if os.path.isfile(_onnx_file(path)):
+            return path
+
+        from transformers import AutoModel, AutoTokenizer
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        # build next to the target and swap in, so a crash never leaves a half-exported model
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        source = model_name
+        if kind == TOKEN and num_layers is not None:
+            # truncated copy: the output of layer num_layers is the last hidden state
+            source = os.path.join(tmp_path, "truncated")
+            model = AutoModel.from_pretrained(model_name)
+            model.encoder.layer = model.encoder.layer[:num_layers]
+            model.config.num_hidden_layers = num_layers
+            model.save_pretrained(source)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(source)
+
+        model_class = ORTModelForSequenceClassification if kind == CROSS_ENCODER else ORTModelForFeatureExtraction
+        ort_model = model_class.from_pretrained(source, export=True)
+        ort_model.save_pretrained(tmp_path)
+        AutoTokenizer.from_pretrained(source).save_pretrained(tmp_path)
+        if source != model_name:
+            shutil.rmtree(source)
+
+        if ONNX_QUANTIZATION != "none":
+            qconfig = getattr(AutoQuantizationConfig, ONNX_QUANTIZATION)(is_static=False, per_channel=False)
+            ORTQuantizer.from_pretrained(tmp_path, file_name="model.onnx").quantize(
+                quantization_config=qconfig, save_dir=tmp_path
+            )
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return path
+
+
+class OnnxModel:
+    """
+    Exported model plus its tokenizer, run through one onnxruntime CPU session.
+    Texts are sorted by length before batching so each batch pads to
+    similar lengths, and results come back in input order.
+    """
+
+    def __init__(self, model_name: str, kind: str, num_layers: Optional[int] = None, max_length: Optional[int] = None):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.kind = kind
+        self.path = export_model(model_name, kind, num_layers)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.path)
+        self.max_length = max_length or min(self.tokenizer.model_max_length, 512)
+
+        options = onnxruntime.SessionOptions()
+        if ONNX_NUM_THREADS:
+            options.intra_op_num_threads = ONNX_NUM_THREADS
+        self.session = onnxruntime.InferenceSession(_onnx_file(self.path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def run(self, first: List[str], second: Optional[List[str]] = None) -> Tuple[np.ndarray, dict]:
+        # one forward pass; returns the first output and the tokenizer encoding
+        encoded = self.tokenizer(
+            first, second, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feed = {}
+        for name in self.input_names:
+            value = encoded.get(name)
+            feed[name] = (value if value is not None else np.zeros_like(encoded["input_ids"])).astype(np.int64)
+        return self.session.run(None, feed)[0], encoded
+
+    @staticmethod
+    def length_order(texts: List[str]) -> np.ndarray:
+        return np.argsort([-len(t) for t in texts], kind="stable")
+
+
+class OnnxSentenceEncoder(OnnxModel):
+    """
+    Drop-in for SentenceTransformer.encode with mean pooling (the pooling of
+    the paraphrase-multilingual SBERT models, which also truncate at 128 tokens).
+    """
+
+    def __init__(self, model_name: str, max_length: Optional[int] = 128):
+        super().__init__(model_name, SENTENCE, max_length=max_length)
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               show_progress_bar: bool = False) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        order = self.length_order(texts)
+        embeddings = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            hidden, encoded = self.run([texts[i] for i in batch])
+            mask = encoded["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            for i, row in zip(batch, pooled):
+                embeddings[i] = row
+        result = np.stack(embeddings).astype(np.float32)
+        if normalize_embeddings:
+            result /= np.clip(np.linalg.norm(result, axis=1, keepdims=True), 1e-12, None)
+        return result[0] if single else result
+
+
+class OnnxCrossEncoder(OnnxModel):
+    """
+    Drop-in for CrossEncoder.predict: one score per (a, b) pair, with the
+    sigmoid CrossEncoder applies to single-label models (raw logits otherwise).
+    """
+
+    def __init__(self, model_name: str, max_length: Optional[int] = None):
+        super().__init__(model_name, CROSS_ENCODER, max_length=max_length)
+
+    def predict(self, pairs, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        pairs = list(pairs)
+        order = self.length_order([a + b for a, b in pairs])
+        scores = [None] * len(pairs)
+        for start in range(0, len(pairs), batch_size):
+            batch = order[start:start + batch_size]
+            logits, _ = self.run([pairs[i][0] for i in batch], [pairs[i][1] for i in batch])
+            if logits.shape[-1] == 1:
+                logits = 1 / (1 + np.exp(-logits[:, 0]))
+            for i, score in zip(batch, logits):
+                scores[i] = score
+        return np.array(scores, dtype=np.float32)
+
+
+class OnnxTokenEncoder(OnnxModel):
+    """
+    Contextual token embeddings from a model cut at num_layers, as BERTScore
+    uses them.
+    """
+
+    def __init__(self, model_name: str, num_layers: Optional[int] = None, max_length: Optional[int] = None):
+        super().__init__(model_name, TOKEN, num_layers=num_layers, max_length=max_length)
+
+    def embed(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # hidden states [batch, tokens, dim], attention mask and input ids for one padded batch
+        hidden, encoded = self.run(list(texts))
+        return hidden, encoded["attention_mask"], encoded["input_ids"]
+
+
+if __name__ == "__main__":
+    # pre-export at build time, e.g.
+    # python -m analysis.embedding_models.onnx_backend sentence sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2
+    parser = argparse.ArgumentParser(description="Export and quantize a model for the ONNX backend")
+    parser.add_argument("kind", choices=[SENTENCE, CROSS_ENCODER, TOKEN])
+    parser.add_argument("model_name")
+    parser.add_argument("--num-layers", type=int, default=None)
+    args = parser.parse_args()
+    print(export_model(args.model_name, args.kind, args.num_layers))
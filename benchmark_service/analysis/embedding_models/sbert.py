@@ -1,60 +1,139 @@
+import os
 import time
 import re
-from sentence_transformers import SentenceTransformer, util
+import threading
+from typing import List
 
+import numpy as np
+
+from .onnx_backend import check_backend
+
+
+# off by default: the model needs sentence-transformers (and torch) installed
+SBERT_ENABLED = os.getenv("SBERT_ENABLED", "0") == "1"
+model_name = os.getenv("SBERT_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# texts per forward pass inside one encode call
+SBERT_BATCH_SIZE = int(os.getenv("SBERT_BATCH_SIZE", "32"))
+SBERT_DEVICE = os.getenv("SBERT_DEVICE", "cpu")
+# "torch" (sentence-transformers) or "onnx" (exported, int8-quantized, see onnx_backend)
+SBERT_BACKEND = check_backend("SBERT_BACKEND", os.getenv("SBERT_BACKEND", "torch"))
 
-model_name = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 _sbert_model = None
+_sbert_lock = threading.Lock()
 
 
-def get_sbert_model():
-    """get model and reuse it."""
+def load_sbert_model():
+    """load the model once; called at startup when SBERT_ENABLED is set."""
     global _sbert_model
-    if _sbert_model is None:
-        _sbert_model = SentenceTransformer(model_name)
+    with _sbert_lock:
+        if _sbert_model is None and SBERT_BACKEND == "onnx":
+            from .onnx_backend import OnnxSentenceEncoder
+            _sbert_model = OnnxSentenceEncoder(model_name)
+        elif _sbert_model is None:
+            from sentence_transformers import SentenceTransformer
+            _sbert_model = SentenceTransformer(model_name, device=SBERT_DEVICE)
     return _sbert_model
 
 
+def get_sbert_model():
+    """get model and reuse it."""
+    return _sbert_model if _sbert_model is not None else load_sbert_model()
+
+
 def simple_sent_split(text: str):
     """split sentences using regex."""
     return [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
 
 
-def get_sbert_suite(benchmark: str, text: str) -> dict:
-    # sbert similarity metrics
+def encode(texts: List[str]) -> np.ndarray:
+    # one batched encode call; unit-length rows, so cosine similarity is a dot product
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return get_sbert_model().encode(
+        texts,
+        batch_size=SBERT_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+
+
+class BenchmarkEmbeddings:
+    """
+    Benchmark side of the SBERT suite: document embedding and sentence
+    embeddings, encoded once and kept on the BenchmarkProfile.
+    """
+
+    def __init__(self, benchmark: str):
+        self.sentences = simple_sent_split(benchmark)
+        embeddings = encode([benchmark] + self.sentences)
+        self.doc = embeddings[0]
+        self.sentence_embeddings = embeddings[1:]
+
+
+def get_benchmark_embeddings(benchmark: str, profile=None) -> BenchmarkEmbeddings:
+    # cached per benchmark_id through the profile (keyed by model and backend, in case they change)
+    if profile is None:
+        return BenchmarkEmbeddings(benchmark)
+    key = ("sbert", model_name, SBERT_BACKEND)
+    embeddings = profile.embeddings.get(key)
+    if embeddings is None:
+        embeddings = BenchmarkEmbeddings(benchmark)
+        profile.embeddings[key] = embeddings
+    return embeddings
+
+
+def get_sbert_suite_batch(benchmark: str, texts: List[str], profile=None) -> List[dict]:
+    """
+    sbert similarity metrics for every text of a request. Documents and
+    sentences of all texts go through one encode call; the benchmark side
+    comes from the profile cache.
+    Returns one dict per text, same shape as get_sbert_suite.
+    """
     start = time.time()
-    sbert = get_sbert_model()
-
-    # embedding on document
-    emb_bench = sbert.encode(benchmark, convert_to_tensor=True)
-    emb_student = sbert.encode(text, convert_to_tensor=True)
-    cosine_doc = util.cos_sim(emb_bench, emb_student).item()
-
-    # embedding on sents
-    bench_sents = simple_sent_split(benchmark)
-    stud_sents = simple_sent_split(text)
-
-    bench_embs = sbert.encode(bench_sents, convert_to_tensor=True) if bench_sents else None
-    stud_embs = sbert.encode(stud_sents, convert_to_tensor=True) if stud_sents else None
-
-    # calculate coherence and simple if test 
-    coherence = None
-    if stud_embs is not None and len(stud_embs) > 1:
-        coherence = float(util.cos_sim(stud_embs[:-1], stud_embs[1:]).mean())
-
-    # calculate coverage and simple if test
-    coverage = None
-    if bench_embs is not None and stud_embs is not None:
-        coverage = float(util.cos_sim(bench_embs, stud_embs).max(dim=1).values.mean())
-
-    elapsed = time.time() - start
-
-    return {
-        "cosine_similarity_doc": cosine_doc,
-        "coherence_student": coherence,
-        "coverage_benchmark": coverage,
-        "embedding_dim": emb_bench.shape[-1],
-        "n_benchmark_sentences": len(bench_sents),
-        "n_student_sentences": len(stud_sents),
-        "elapsed_time_sec": elapsed,
-    }
+    if not texts:
+        return []
+
+    bench = get_benchmark_embeddings(benchmark, profile)
+
+    # documents first, then every sentence; slices map them back per text
+    stud_sents = [simple_sent_split(text) for text in texts]
+    embeddings = encode(list(texts) + [s for sents in stud_sents for s in sents])
+    doc_embs = embeddings[:len(texts)]
+
+    results = []
+    offset = len(texts)
+    for doc_emb, sents in zip(doc_embs, stud_sents):
+        sent_embs = embeddings[offset:offset + len(sents)]
+        offset += len(sents)
+
+        cosine_doc = float(bench.doc @ doc_emb)
+
+        # calculate coherence and simple if test (mean over the full cos_sim matrix, as before)
+        coherence = None
+        if len(sents) > 1:
+            coherence = float((sent_embs[:-1] @ sent_embs[1:].T).mean())
+
+        # calculate coverage and simple if test
+        coverage = None
+        if len(bench.sentences) and len(sents):
+            coverage = float((bench.sentence_embeddings @ sent_embs.T).max(axis=1).mean())
+
+        results.append({
+            "cosine_similarity_doc": cosine_doc,
+            "coherence_student": coherence,
+            "coverage_benchmark": coverage,
+            "embedding_dim": int(bench.doc.shape[-1]),
+            "n_benchmark_sentences": len(bench.sentences),
+            "n_student_sentences": len(sents),
+        })
+
+    elapsed = (time.time() - start) / len(texts)
+    for result in results:
+        result["elapsed_time_sec"] = elapsed
+    return results
+
+
+def get_sbert_suite(benchmark: str, text: str, profile=None) -> dict:
+    # sbert similarity metrics for a single text
+    return get_sbert_suite_batch(benchmark, [text], profile=profile)[0]
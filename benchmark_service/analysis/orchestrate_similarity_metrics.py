@@ -3,43 +3,115 @@
 from .classical_models.BLEU import get_bleu
 from .classical_models.ROUGE import get_rouge
 from .classical_models.ChrF import get_chrf
-from .classical_models.tfidf import get_tfidf_cosine
+from .classical_models.tfidf import get_tfidf_cosine, get_tfidf_cosine_batch, TFIDF_MODE
 
 # Embedding models  
 
+# SBERT: loaded once at startup and batched per request when SBERT_ENABLED is set
+from .embedding_models.sbert import get_sbert_suite, get_sbert_suite_batch, SBERT_ENABLED
+# Cross encoder: one batched predict per request when CROSSENCODER_ENABLED is set
+from .embedding_models.cross_encoder import get_crossencoder_score, get_crossencoder_scores_batch, CROSSENCODER_ENABLED
+# BERTScore: resident model, reference embeddings cached per benchmark, when BERTSCORE_ENABLED is set
+from .embedding_models.bertscore import get_bertscore, get_bertscore_batch, BERTSCORE_ENABLED
+
 """ These take insane load time and are slow in executing for me
-from .embedding_models.sbert import get_sbert_suite
-from .embedding_models.cross_encoder import get_crossencoder_score
 from .embedding_models.norbert import get_norbert_suite
-from .embedding_models.bertscore import get_bertscore
 """
 
 # Topic models
-from .topic_models.LDA import get_lda_suite
+from .topic_models.LDA import get_lda_suite, get_corpus_model
+
+# Precomputed reference side
+from .benchmark_profile import BenchmarkProfile
+
+
+def return_similarity_matrices(student_texts: list, benchmark_text: str, profile: BenchmarkProfile = None) -> list:
+    # similarity metrics suite for every text of a request against one benchmark
+    return list(iter_similarity_matrices(student_texts, benchmark_text, profile=profile))
 
 
-def return_similarity_matrix(student_text: str, benchmark_text: str) -> dict:
-    # similarity metrics suite
+def iter_chunked(batch_fn, texts: list, chunk_size: int):
+    # run a batched engine one chunk of texts at a time, only when the next result is needed
+    for start in range(0, len(texts), max(1, chunk_size)):
+        yield from batch_fn(texts[start:start + chunk_size])
+
+
+def iter_similarity_matrices(student_texts: list, benchmark_text: str, profile: BenchmarkProfile = None, chunk_size: int = None):
+    # lazy variant: yields each text's suite as soon as it is computed. The embedding
+    # engines run once over the whole request, or, with chunk_size (streaming), once
+    # per chunk of texts, so the first result does not wait for the whole request
+    
+    if profile is None:
+        profile = BenchmarkProfile("", benchmark_text)
+    if chunk_size is None:
+        chunk_size = len(student_texts)
+    
+    # TF-IDF batch mode: one shared vocabulary and one sparse mat-vec for the whole request
+    if TFIDF_MODE == "batch":
+        tfidf_batch = get_tfidf_cosine_batch(benchmark_text, student_texts, profile=profile)
+    else:
+        tfidf_batch = [None] * len(student_texts)
     
+    # SBERT: every document and sentence of the request (or chunk) in one encode call
+    if SBERT_ENABLED:
+        sbert_batch = iter_chunked(lambda texts: get_sbert_suite_batch(benchmark_text, texts, profile=profile),
+                                   student_texts, chunk_size)
+    else:
+        sbert_batch = [None] * len(student_texts)
+    
+    # Cross encoder: every (benchmark, essay) or sentence pair of the request (or chunk) in one predict call
+    if CROSSENCODER_ENABLED:
+        crossencoder_batch = iter_chunked(lambda texts: get_crossencoder_scores_batch(benchmark_text, texts),
+                                          student_texts, chunk_size)
+    else:
+        crossencoder_batch = [None] * len(student_texts)
+    
+    # BERTScore: all candidate texts (or a chunk) against the cached benchmark embeddings in padded batches
+    if BERTSCORE_ENABLED:
+        bertscore_batch = iter_chunked(lambda texts: get_bertscore_batch(texts, benchmark_text, profile=profile),
+                                       student_texts, chunk_size)
+    else:
+        bertscore_batch = [None] * len(student_texts)
+    
+    for student_text, tfidf_results, sbert_results, crossencoder_results, bertscore_results in zip(
+        student_texts, tfidf_batch, sbert_batch, crossencoder_batch, bertscore_batch
+    ):
+        yield return_similarity_matrix(student_text, benchmark_text, profile=profile, tfidf_results=tfidf_results,
+                                       sbert_results=sbert_results, crossencoder_results=crossencoder_results,
+                                       bertscore_results=bertscore_results)
+
+
+def return_similarity_matrix(student_text: str, benchmark_text: str, profile: BenchmarkProfile = None, tfidf_results: dict = None,
+                             sbert_results: dict = None, crossencoder_results: dict = None, bertscore_results: dict = None) -> dict:
+    # similarity metrics suite; pass a cached profile to skip re-analysing the benchmark
+    
+    if profile is None:
+        profile = BenchmarkProfile("", benchmark_text)
     
     # Classical models (fast)
-    bleu_results = get_bleu(student_text, benchmark_text)
-    rouge_results = get_rouge(student_text, benchmark_text) 
-    chrf_results = get_chrf(student_text, benchmark_text)
-    tfidf_results = get_tfidf_cosine(benchmark_text, student_text)
+    bleu_results = get_bleu(student_text, benchmark_text, profile=profile)
+    rouge_results = get_rouge(student_text, benchmark_text, profile=profile) 
+    chrf_results = get_chrf(student_text, benchmark_text, profile=profile)
+    if tfidf_results is None:
+        tfidf_results = get_tfidf_cosine(benchmark_text, student_text, profile=profile)
+    
+    # Embedding models
+    if SBERT_ENABLED and sbert_results is None:
+        sbert_results = get_sbert_suite(benchmark_text, student_text, profile=profile)
+    if CROSSENCODER_ENABLED and crossencoder_results is None:
+        crossencoder_results = get_crossencoder_score(benchmark_text, student_text)
+    if BERTSCORE_ENABLED and bertscore_results is None:
+        bertscore_results = get_bertscore(student_text, benchmark_text, profile=profile)
     
-    # Embedding models (very slow, dont use )
+    # (very slow, dont use )
     """
-    sbert_results = get_sbert_suite(benchmark_text, student_text)
-    crossencoder_results = get_crossencoder_score(benchmark_text, student_text)
     norbert_results = get_norbert_suite(benchmark_text, student_text)
-    bertscore_results = get_bertscore(student_text, benchmark_text)
     """
 
-    # Topic models (medium speed)
-    lda_results = get_lda_suite(benchmark_text, student_text)
+    # Topic models use the corpus model for this benchmark when one is trained
+    lda_results = get_lda_suite(benchmark_text, student_text, profile=profile, corpus_model=get_corpus_model(profile.benchmark_id))
     
-    return {
+    results = {
         # Classical models
         "bleu": bleu_results,
         "rouge": rouge_results,
@@ -47,11 +119,15 @@ def return_similarity_matrix(student_text: str, benchmark_text: str) -> dict:
         "tfidf": tfidf_results,
         
         # Embedding models
-        # "sbert": sbert_results,
-        # "crossencoder": crossencoder_results,
         # "norbert": norbert_results,
-        # "bertscore": bertscore_results,
         
         # Topic models
         "lda": lda_results,
-    }
\ No newline at end of file
+    }
+    if sbert_results is not None:
+        results["sbert"] = sbert_results
+    if crossencoder_results is not None:
+        results["crossencoder"] = crossencoder_results
+    if bertscore_results is not None:
+        results["bertscore"] = bertscore_results
+    return results
\ No newline at end of file
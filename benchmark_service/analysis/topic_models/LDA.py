@@ -1,4 +1,8 @@
+import os
+import re
 import time
+import threading
+from typing import Dict, List, Optional
 from gensim import corpora, models
 from gensim.matutils import sparse2full
 from scipy.spatial.distance import cosine
@@ -16,23 +20,149 @@ def get_topic_distribution(lda_model, bow, num_topics: int):
     return sparse2full(dist_sparse, num_topics)
 
 
-def get_lda_suite(benchmark: str, student: str, num_topics: int = 5) -> dict:
-    # lda topic similarity
+# --- corpus-level models: trained once per benchmark/assignment corpus, inference only per text ---
+
+LDA_MODEL_DIR = os.getenv("LDA_MODEL_DIR", "data/lda_models")
+LDA_DEFAULT_CORPUS = os.getenv("LDA_DEFAULT_CORPUS", "default")
+
+_CORPUS_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class CorpusLda:
+    """
+    Trained LDA model plus its dictionary for one corpus.
+    `trained_at` versions the model so cached benchmark distributions can be invalidated.
+    """
+
+    def __init__(self, corpus_id: str, lda, dictionary, trained_at: float):
+        self.corpus_id = corpus_id
+        self.lda = lda
+        self.dictionary = dictionary
+        self.num_topics = lda.num_topics
+        self.trained_at = trained_at
+
+    def topic_distribution(self, tokens: List[str]):
+        return get_topic_distribution(self.lda, self.dictionary.doc2bow(tokens), self.num_topics)
+
+
+_corpus_models: Dict[str, CorpusLda] = {}
+_corpus_models_lock = threading.Lock()
+
+
+def _corpus_dir(corpus_id: str, model_dir: str) -> str:
+    if not _CORPUS_ID_PATTERN.match(corpus_id) or corpus_id in (".", ".."):
+        raise ValueError(f"Invalid corpus_id '{corpus_id}': use letters, digits, '_', '-' or '.'")
+    return os.path.join(model_dir, corpus_id)
+
+
+def train_corpus_lda(corpus_id: str, texts: List[str], num_topics: int = 5, passes: int = 10,
+                     model_dir: str = LDA_MODEL_DIR) -> dict:
+    """
+    Train an LDA model on a batch of texts, save it under model_dir/corpus_id
+    and make it the active model for that corpus.
+    """
     start = time.time()
+    path = _corpus_dir(corpus_id, model_dir)
 
-    # Preprocess texts
-    texts = [preprocess(benchmark), preprocess(student)]
-    dictionary = corpora.Dictionary(texts)
-    corpus = [dictionary.doc2bow(t) for t in texts]
+    tokenized = [preprocess(text) for text in texts]
+    dictionary = corpora.Dictionary(tokenized)
+    if len(dictionary) == 0:
+        raise ValueError("Cannot train LDA: the texts contain no alphabetic tokens")
+    corpus = [dictionary.doc2bow(tokens) for tokens in tokenized]
 
-    # Train LDA (toy example: only benchmark + student doc)
     lda = models.LdaModel(
-        corpus, num_topics=num_topics, id2word=dictionary, passes=10, random_state=42
+        corpus, num_topics=num_topics, id2word=dictionary, passes=passes, random_state=42
     )
 
-    # Topic distributions
-    bench_dist = get_topic_distribution(lda, corpus[0], num_topics)
-    stud_dist = get_topic_distribution(lda, corpus[1], num_topics)
+    os.makedirs(path, exist_ok=True)
+    lda.save(os.path.join(path, "lda.model"))
+    dictionary.save(os.path.join(path, "dictionary.dict"))
+
+    model = CorpusLda(corpus_id, lda, dictionary, trained_at=time.time())
+    with _corpus_models_lock:
+        _corpus_models[corpus_id] = model
+
+    return {
+        "corpus_id": corpus_id,
+        "num_topics": num_topics,
+        "num_documents": len(texts),
+        "vocab_size": len(dictionary),
+        "elapsed_time_sec": time.time() - start,
+    }
+
+
+def load_corpus_models(model_dir: str = LDA_MODEL_DIR) -> List[str]:
+    # load every saved corpus model under model_dir; returns the loaded corpus ids
+    if not os.path.isdir(model_dir):
+        return []
+
+    loaded = []
+    for corpus_id in sorted(os.listdir(model_dir)):
+        path = os.path.join(model_dir, corpus_id)
+        model_path = os.path.join(path, "lda.model")
+        dict_path = os.path.join(path, "dictionary.dict")
+        if not (os.path.isfile(model_path) and os.path.isfile(dict_path)):
+            continue
+        lda = models.LdaModel.load(model_path)
+        dictionary = corpora.Dictionary.load(dict_path)
+        with _corpus_models_lock:
+            _corpus_models[corpus_id] = CorpusLda(corpus_id, lda, dictionary, os.path.getmtime(model_path))
+        loaded.append(corpus_id)
+    return loaded
+
+
+def get_corpus_model(benchmark_id: Optional[str] = None) -> Optional[CorpusLda]:
+    # model trained for this benchmark, else the default corpus model, else None
+    with _corpus_models_lock:
+        if benchmark_id and benchmark_id in _corpus_models:
+            return _corpus_models[benchmark_id]
+        return _corpus_models.get(LDA_DEFAULT_CORPUS)
+
+
+def list_corpus_models() -> List[dict]:
+    with _corpus_models_lock:
+        return [
+            {"corpus_id": m.corpus_id, "num_topics": m.num_topics, "vocab_size": len(m.dictionary)}
+            for m in _corpus_models.values()
+        ]
+
+
+def get_lda_suite(benchmark: str, student: str, num_topics: int = 5, profile=None, corpus_model: CorpusLda = None) -> dict:
+    """
+    lda topic similarity.
+    With a corpus_model only topic inference runs; the benchmark distribution is
+    cached on the profile. Without one, a toy model is trained on the pair.
+    """
+    start = time.time()
+
+    # Preprocess texts
+    bench_tokens = profile.lda_tokens if profile is not None else preprocess(benchmark)
+    stud_tokens = preprocess(student)
+
+    if corpus_model is not None:
+        num_topics = corpus_model.num_topics
+        cache_key = (corpus_model.corpus_id, corpus_model.trained_at)
+        bench_dist = profile.lda_topic_dists.get(cache_key) if profile is not None else None
+        if bench_dist is None:
+            bench_dist = corpus_model.topic_distribution(bench_tokens)
+            if profile is not None:
+                profile.lda_topic_dists[cache_key] = bench_dist
+        stud_dist = corpus_model.topic_distribution(stud_tokens)
+        model_name = f"corpus:{corpus_model.corpus_id}"
+    else:
+        texts = [bench_tokens, stud_tokens]
+        dictionary = corpora.Dictionary(texts)
+        corpus = [dictionary.doc2bow(t) for t in texts]
+
+        # Train LDA (toy example: only benchmark + student doc)
+        lda = models.LdaModel(
+            corpus, num_topics=num_topics, id2word=dictionary, passes=10, random_state=42
+        )
+
+        # Topic distributions
+        bench_dist = get_topic_distribution(lda, corpus[0], num_topics)
+        stud_dist = get_topic_distribution(lda, corpus[1], num_topics)
+        model_name = "pair"
 
     # Compare distributions
     cos_sim = 1 - cosine(bench_dist, stud_dist)
@@ -41,6 +171,7 @@ def get_lda_suite(benchmark: str, student: str, num_topics: int = 5) -> dict:
     elapsed = time.time() - start
 
     return {
+        "model": model_name,
         "num_topics": num_topics,
         "topic_dist_benchmark": bench_dist.tolist(),
         "topic_dist_student": stud_dist.tolist(),
@@ -1,11 +1,58 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from schemas import BenchmarkRequestIn, BenchmarkResultOut, ResultOut, ComparisonOut
-from analysis.orchestrate_similarity_metrics import return_similarity_matrix
+from fastapi.responses import StreamingResponse
+from schemas import (
+    BenchmarkRequestIn, BenchmarkResultOut, ResultOut, ComparisonOut, LdaTrainIn, LdaTrainOut,
+    BenchmarkBatchRequestIn, BenchmarkBatchResultOut, BatchResultOut, StudentComparisonsOut,
+    BenchmarkJobIn, JobStatusOut,
+)
+from analysis.orchestrate_similarity_metrics import return_similarity_matrices, iter_similarity_matrices
+from analysis.classical_models.tfidf import load_fitted_vectorizer
+from analysis.benchmark_profile import get_benchmark_profile
+from analysis.topic_models.LDA import load_corpus_models, train_corpus_lda, list_corpus_models
+from analysis.embedding_models.sbert import load_sbert_model, SBERT_ENABLED, model_name as sbert_model_name
+from analysis.embedding_models.cross_encoder import get_crossencoder_model, CROSSENCODER_ENABLED, model_name as crossencoder_model_name
+from analysis.embedding_models.bertscore import get_bertscore_model, BERTSCORE_ENABLED, model_name as bertscore_model_name
+from job_queue import JobQueue, JobQueueFull, InvalidCallbackUrl, check_callback_url, DONE, FAILED
+import os
 import json
 import time
 from starlette.concurrency import run_in_threadpool
 
-app = FastAPI()
+# texts per embedding-engine call on /compare-stream; small so the first line is not held back by the whole request
+STREAM_CHUNK_SIZE = int(os.getenv("BENCHMARK_STREAM_CHUNK_SIZE", "8"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load persisted corpus LDA models so scoring only runs inference
+    start_time = time.perf_counter()
+    loaded = await run_in_threadpool(load_corpus_models)
+    print(f"Loaded {len(loaded)} corpus LDA models {loaded} in {time.perf_counter() - start_time:.4f} seconds")
+    # pre-fitted course TF-IDF vocabulary for the batch mode, when configured
+    if await run_in_threadpool(load_fitted_vectorizer) is not None:
+        print("Loaded pre-fitted TF-IDF vectorizer")
+    # embedding model stays resident, so requests only run inference
+    if SBERT_ENABLED:
+        start_time = time.perf_counter()
+        await run_in_threadpool(load_sbert_model)
+        print(f"Loaded SBERT model {sbert_model_name} in {time.perf_counter() - start_time:.4f} seconds")
+    if CROSSENCODER_ENABLED:
+        start_time = time.perf_counter()
+        await run_in_threadpool(get_crossencoder_model)
+        print(f"Loaded cross encoder {crossencoder_model_name} in {time.perf_counter() - start_time:.4f} seconds")
+    if BERTSCORE_ENABLED:
+        start_time = time.perf_counter()
+        await run_in_threadpool(get_bertscore_model)
+        print(f"Loaded BERTScore model {bertscore_model_name} in {time.perf_counter() - start_time:.4f} seconds")
+    resumed = job_queue.resume()
+    if resumed:
+        print(f"Resumed {resumed} unfinished jobs")
+    yield
+    job_queue.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 def process_benchmark_request(request: BenchmarkRequestIn) -> BenchmarkResultOut:
@@ -20,17 +67,17 @@ def process_benchmark_request(request: BenchmarkRequestIn) -> BenchmarkResultOut
     benchmark_text = request_dict["benchmark"]["benchmark_text"]
     texts = request_dict["texts"]
     
+    # reference side is analysed once per benchmark and reused across texts and requests
+    profile = get_benchmark_profile(benchmark_id, benchmark_text)
+    
+    all_metrics = return_similarity_matrices([t["text"] for t in texts], benchmark_text, profile=profile)
+    
     comparisons = []
     
-    for text_item in texts:
-        text_id = text_item["text_id"]
-        text_content = text_item["text"]
-        
-        benchmark_metrics = return_similarity_matrix(text_content, benchmark_text)
-        
+    for text_item, benchmark_metrics in zip(texts, all_metrics):
         comparison = {
-            "text_id": text_id,
-            "text": text_content,
+            "text_id": text_item["text_id"],
+            "text": text_item["text"],
             "benchmark_metrics": benchmark_metrics
         }
         comparisons.append(comparison)
@@ -48,6 +95,98 @@ def process_benchmark_request(request: BenchmarkRequestIn) -> BenchmarkResultOut
         result=result
     )
 
+def process_benchmark_batch_request(request: BenchmarkBatchRequestIn, progress=None) -> BenchmarkBatchResultOut:
+    """
+    Input: request (BenchmarkBatchRequestIn), progress (optional callable taking the number of finished texts)
+    Output: BenchmarkBatchResultOut
+    """
+    benchmark_id = request.benchmark.benchmark_id
+    benchmark_text = request.benchmark.benchmark_text
+    
+    profile = get_benchmark_profile(benchmark_id, benchmark_text)
+    
+    # every text of every student in one suite run, then split back per student
+    all_texts = [t.text for student in request.students for t in student.texts]
+    all_metrics = iter_similarity_matrices(all_texts, benchmark_text, profile=profile)
+    
+    students_out = []
+    done = 0
+    for student in request.students:
+        comparisons = []
+        for t in student.texts:
+            comparisons.append(ComparisonOut(text_id=t.text_id, text=t.text, benchmark_metrics=next(all_metrics)))
+            done += 1
+            if progress is not None:
+                progress(done)
+        students_out.append(StudentComparisonsOut(student_id=student.student_id, comparisons=comparisons))
+    
+    result = BatchResultOut(
+        benchmark_id=benchmark_id,
+        benchmark_text=benchmark_text,
+        students=students_out,
+        message="Benchmark comparisons computed successfully"
+    )
+    
+    return BenchmarkBatchResultOut(
+        status="ok",
+        result=result
+    )
+
+def iter_comparison_lines(request: BenchmarkBatchRequestIn, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Input: request (BenchmarkBatchRequestIn), chunk_size (int)
+    Output: generator of NDJSON lines
+    One line per text as soon as it is compared, then a summary line. The
+    embedding models score chunk_size texts at a time.
+    """
+    start_time = time.perf_counter()
+    benchmark_id = request.benchmark.benchmark_id
+    benchmark_text = request.benchmark.benchmark_text
+    
+    num_texts = 0
+    try:
+        profile = get_benchmark_profile(benchmark_id, benchmark_text)
+        all_texts = [t.text for student in request.students for t in student.texts]
+        all_metrics = iter_similarity_matrices(all_texts, benchmark_text, profile=profile, chunk_size=chunk_size)
+        
+        for student in request.students:
+            for text_item in student.texts:
+                benchmark_metrics = next(all_metrics)
+                num_texts += 1
+                yield json.dumps({
+                    "type": "text",
+                    "student_id": student.student_id,
+                    "text_id": text_item.text_id,
+                    "benchmark_metrics": benchmark_metrics
+                }) + "\n"
+    except Exception as e:
+        # the status line is already sent, so report the failure in-band
+        print(f"Error processing stream: {str(e)}")
+        yield json.dumps({"type": "error", "detail": "Internal server error", "texts": num_texts}) + "\n"
+        return
+    
+    elapsed_time = time.perf_counter() - start_time
+    print(f"Streamed {num_texts} comparisons for {len(request.students)} students in {elapsed_time:.4f} seconds")
+    yield json.dumps({
+        "type": "summary",
+        "status": "ok",
+        "benchmark_id": benchmark_id,
+        "students": len(request.students),
+        "texts": num_texts,
+        "elapsed_time_sec": elapsed_time
+    }) + "\n"
+
+def run_benchmark_job(payload: dict, progress) -> dict:
+    """
+    Input: payload (BenchmarkBatchRequestIn as dict), progress (callable taking the number of finished texts)
+    Output: BenchmarkBatchResultOut as dict
+    Job handler, runs on a job worker thread.
+    """
+    return process_benchmark_batch_request(BenchmarkBatchRequestIn(**payload), progress=progress).dict()
+
+# Local job queue for batches that outlive a gateway timeout
+job_queue = JobQueue(run_benchmark_job)
+
 @app.post("/compare", response_model=BenchmarkResultOut)
 async def compare_texts(request: BenchmarkRequestIn):
     """
@@ -65,6 +204,33 @@ async def compare_texts(request: BenchmarkRequestIn):
         print(f"Error processing request: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/compare-batch", response_model=BenchmarkBatchResultOut)
+async def compare_batch(request: BenchmarkBatchRequestIn):
+    """
+    Input: request (BenchmarkBatchRequestIn)
+    Output: BenchmarkBatchResultOut
+    """
+    start_time = time.perf_counter()
+    
+    try:
+        result = await run_in_threadpool(process_benchmark_batch_request, request)
+        elapsed_time = time.perf_counter() - start_time
+        num_texts = sum(len(student.texts) for student in request.students)
+        print(f"Processed {num_texts} comparisons for {len(request.students)} students in {elapsed_time:.4f} seconds")
+        return result
+    except Exception as e:
+        print(f"Error processing batch request: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.post("/compare-stream")
+async def compare_stream(request: BenchmarkBatchRequestIn):
+    """
+    Input: request (BenchmarkBatchRequestIn)
+    Output: StreamingResponse (application/x-ndjson)
+    """
+    # sync generator: Starlette runs it in the thread pool, off the event loop
+    return StreamingResponse(iter_comparison_lines(request), media_type="application/x-ndjson")
+
 @app.post("/compare-mock", response_model=BenchmarkResultOut)
 async def compare_mock():
     """
@@ -88,6 +254,82 @@ async def compare_mock():
         print(f"Error processing mock request: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing mock data")
 
+@app.post("/jobs", response_model=JobStatusOut, status_code=202)
+async def submit_job(job: BenchmarkJobIn):
+    """
+    Input: job (BenchmarkJobIn)
+    Output: JobStatusOut
+    """
+    if job.callback_url:
+        try:
+            await run_in_threadpool(check_callback_url, job.callback_url)
+        except InvalidCallbackUrl as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    request = BenchmarkBatchRequestIn(benchmark=job.benchmark, students=job.students)
+    num_texts = sum(len(student.texts) for student in request.students)
+    try:
+        status = job_queue.submit(request.dict(), num_texts, job.callback_url)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Job queue is full ({str(e)})")
+    print(f"Queued job {status['job_id']} with {num_texts} texts")
+    return status
+
+@app.get("/jobs/{job_id}", response_model=JobStatusOut)
+async def get_job(job_id: str):
+    """
+    Input: job_id (str)
+    Output: JobStatusOut
+    """
+    status = job_queue.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/jobs/{job_id}/result", response_model=BenchmarkBatchResultOut)
+async def get_job_result(job_id: str):
+    """
+    Input: job_id (str)
+    Output: BenchmarkBatchResultOut
+    """
+    status = job_queue.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {status['error']}")
+    if status["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    return job_queue.result(job_id)
+
+@app.post("/lda/train", response_model=LdaTrainOut)
+async def lda_train(request: LdaTrainIn):
+    """
+    Input: request (LdaTrainIn)
+    Output: LdaTrainOut
+    (Re)trains and persists the corpus LDA model for request.corpus_id
+    """
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="texts must not be empty")
+    try:
+        info = await run_in_threadpool(
+            train_corpus_lda, request.corpus_id, request.texts, request.num_topics, request.passes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error training LDA model: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    print(f"Trained LDA model '{info['corpus_id']}' on {info['num_documents']} texts in {info['elapsed_time_sec']:.4f} seconds")
+    return LdaTrainOut(status="ok", **info)
+
+@app.get("/lda/models")
+async def lda_models():
+    """
+    Input: None
+    Output: dict
+    """
+    return {"models": list_corpus_models()}
+
 @app.get("/health")
 async def health_check():
     """
@@ -110,7 +352,14 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /compare": "Compare texts",
+            "POST /compare-batch": "Compare the texts of many students against one benchmark",
+            "POST /compare-stream": "Batch comparison, streamed as NDJSON",
             "POST /compare-mock": "Compare using mock data", 
+            "POST /jobs": "Queue a batch comparison as a background job",
+            "GET /jobs/{job_id}": "Job status and progress",
+            "GET /jobs/{job_id}/result": "Result of a finished job",
+            "POST /lda/train": "Train and persist a corpus LDA model",
+            "GET /lda/models": "List loaded corpus LDA models",
             "GET /health": "Health check",
             "GET /": "Service info"
         }
@@ -0,0 +1,256 @@
+# metrics_service/job_queue.py and benchmark_service/job_queue.py are kept in sync
+# (each service is built from its own directory); change both together.
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import ipaddress
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", "100"))
+JOBS_TTL_SECONDS = float(os.getenv("JOBS_TTL_SECONDS", "86400"))
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "")  # empty: jobs live in memory only
+JOBS_CALLBACK_TIMEOUT = float(os.getenv("JOBS_CALLBACK_TIMEOUT", "10"))
+# comma-separated hosts callbacks may go to; empty: any host that resolves to public addresses only
+JOBS_CALLBACK_HOSTS = {h.strip().lower() for h in os.getenv("JOBS_CALLBACK_HOSTS", "").split(",") if h.strip()}
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# status fields returned to clients and sent to callbacks
+_STATUS_FIELDS = ("job_id", "status", "done", "total", "created_at", "started_at", "finished_at", "error")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class InvalidCallbackUrl(ValueError):
+    pass
+
+
+def check_callback_url(url: str) -> None:
+    """
+    Refuse callback URLs that would have the service POST into its own
+    network: with JOBS_CALLBACK_HOSTS set only those hosts are allowed,
+    otherwise every address the host resolves to must be public (no
+    loopback, private, link-local or reserved ranges).
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise InvalidCallbackUrl("callback_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if JOBS_CALLBACK_HOSTS:
+        if host not in JOBS_CALLBACK_HOSTS:
+            raise InvalidCallbackUrl(f"callback host {host} is not in JOBS_CALLBACK_HOSTS")
+        return
+
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (ValueError, OSError):
+        raise InvalidCallbackUrl(f"callback host {host} cannot be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise InvalidCallbackUrl(f"callback host {host} resolves to a non-public address")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # a redirect could point the callback at an internal host after the check
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class JobQueue:
+    """
+    Local job queue for long-running batch scoring, no external broker.
+    Jobs run on a bounded thread pool through `handler(payload, progress)`,
+    where progress(done) reports how many texts are finished.
+    Without db_path, jobs and results live in memory. With db_path, jobs,
+    payloads and results are kept in a SQLite file, and unfinished jobs are
+    queued again by resume() after a restart.
+    Finished jobs are dropped after ttl_seconds.
+    """
+
+    def __init__(self, handler: Callable[[dict, Callable[[int], None]], dict], workers: int = JOBS_WORKERS,
+                 max_pending: int = JOBS_MAX_PENDING, ttl_seconds: float = JOBS_TTL_SECONDS,
+                 db_path: Optional[str] = JOBS_DB_PATH):
+        self.handler = handler
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+
+        self._jobs: Dict[str, dict] = {}
+        self._results: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._db = None
+
+        if self.db_path:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, done INTEGER NOT NULL, total INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, error TEXT, "
+                "callback_url TEXT, payload TEXT, result TEXT)"
+            )
+            self._db.commit()
+            for row in self._db.execute(
+                "SELECT job_id, status, done, total, created_at, started_at, finished_at, error, callback_url FROM jobs"
+            ):
+                self._jobs[row[0]] = dict(zip(_STATUS_FIELDS + ("callback_url",), row))
+
+    def submit(self, payload: dict, total: int, callback_url: Optional[str] = None) -> dict:
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            pending = sum(1 for job in self._jobs.values() if job["status"] in (QUEUED, RUNNING))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs pending")
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": QUEUED,
+                "done": 0,
+                "total": total,
+                "created_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+                "callback_url": callback_url,
+            }
+            self._jobs[job["job_id"]] = job
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO jobs (job_id, status, done, total, created_at, callback_url, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job["job_id"], QUEUED, 0, total, now, callback_url, json.dumps(payload)),
+                )
+                self._db.commit()
+            status = self._status(job)
+
+        self._executor.submit(self._run, job["job_id"], payload)
+        return status
+
+    def resume(self) -> int:
+        # queue again the jobs a previous process accepted but did not finish
+        if self._db is None:
+            return 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id, payload FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+            for job_id, _ in rows:
+                self._jobs[job_id].update(status=QUEUED, done=0, started_at=None)
+        for job_id, payload in rows:
+            self._executor.submit(self._run, job_id, json.loads(payload))
+        return len(rows)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._status(job) if job is not None else None
+
+    def result(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            if job_id in self._results:
+                return self._results[job_id]
+            if self._db is not None:
+                row = self._db.execute("SELECT result FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is not None and row[0] is not None:
+                    return json.loads(row[0])
+            return None
+
+    def _run(self, job_id: str, payload: dict) -> None:
+        self._update(job_id, status=RUNNING, started_at=time.time())
+
+        def progress(done: int) -> None:
+            # progress is only kept in memory; the disk tier stores state changes
+            with self._lock:
+                self._jobs[job_id]["done"] = done
+
+        try:
+            result = self.handler(payload, progress)
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, status=FAILED, finished_at=time.time(), error=str(e))
+        else:
+            self._update(job_id, status=DONE, finished_at=time.time(), result=result)
+        self._notify(job_id)
+
+    def _update(self, job_id: str, result: Optional[dict] = None, **fields) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            if fields.get("status") == DONE:
+                job["done"] = job["total"]
+            if self._db is not None:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, done = ?, started_at = ?, finished_at = ?, error = ?, result = ?, "
+                    "payload = CASE WHEN ? IN (?, ?) THEN NULL ELSE payload END WHERE job_id = ?",
+                    (job["status"], job["done"], job["started_at"], job["finished_at"], job["error"],
+                     json.dumps(result) if result is not None else None,
+                     job["status"], DONE, FAILED, job_id),
+                )
+                self._db.commit()
+            elif result is not None:
+                self._results[job_id] = result
+
+    def _notify(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            callback_url = job["callback_url"]
+            status = self._status(job)
+        if not callback_url:
+            return
+        try:
+            # checked again at send time: the host may resolve differently by now, or the job was resumed
+            check_callback_url(callback_url)
+            request = urllib.request.Request(
+                callback_url,
+                data=json.dumps(status).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            _callback_opener.open(request, timeout=JOBS_CALLBACK_TIMEOUT).close()
+        except Exception as e:
+            print(f"Job {job_id} callback to {callback_url} failed: {str(e)}")
+
+    def _purge(self, now: float) -> None:
+        # caller holds the lock
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._results.pop(job_id, None)
+        if expired and self._db is not None:
+            self._db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (now - self.ttl_seconds,))
+            self._db.commit()
+
+    @staticmethod
+    def _status(job: dict) -> dict:
+        return {field: job[field] for field in _STATUS_FIELDS}
+
+    def close(self) -> None:
+        # queued jobs stay "queued" on disk and are picked up by resume() on the next start
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
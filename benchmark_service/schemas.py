@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class BenchmarkIn(BaseModel):
     """
@@ -52,4 +52,94 @@ class BenchmarkResultOut(BaseModel):
     Output: BaseModel
     """
     status: str
-    result: ResultOut
\ No newline at end of file
+    result: ResultOut
+
+class StudentTextsIn(BaseModel):
+    """
+    Input: student_id (str), texts (List[TextIn])
+    Output: BaseModel
+    """
+    student_id: str
+    texts: List[TextIn]
+
+class BenchmarkBatchRequestIn(BaseModel):
+    """
+    Input: benchmark (BenchmarkIn), students (List[StudentTextsIn])
+    Output: BaseModel
+    One benchmark compared against the texts of many students
+    """
+    benchmark: BenchmarkIn
+    students: List[StudentTextsIn]
+
+class BenchmarkJobIn(BenchmarkBatchRequestIn):
+    """
+    Input: benchmark (BenchmarkIn), students (List[StudentTextsIn]), callback_url (optional str)
+    Output: BaseModel
+    callback_url receives a POST with the job status when the job finishes
+    """
+    callback_url: Optional[str] = None
+
+class StudentComparisonsOut(BaseModel):
+    """
+    Input: student_id (str), comparisons (List[ComparisonOut])
+    Output: BaseModel
+    """
+    student_id: str
+    comparisons: List[ComparisonOut]
+
+class BatchResultOut(BaseModel):
+    """
+    Input: benchmark_id (str), benchmark_text (str), students (List[StudentComparisonsOut]), message (str)
+    Output: BaseModel
+    """
+    benchmark_id: str
+    benchmark_text: str
+    students: List[StudentComparisonsOut]
+    message: str
+
+class BenchmarkBatchResultOut(BaseModel):
+    """
+    Input: status (str), result (BatchResultOut)
+    Output: BaseModel
+    """
+    status: str
+    result: BatchResultOut
+
+class JobStatusOut(BaseModel):
+    """
+    Input: job_id (str), status (str), done (int), total (int), created_at (float),
+           started_at (optional float), finished_at (optional float), error (optional str)
+    Output: BaseModel
+    status is one of queued, running, done, failed; done/total count texts
+    """
+    job_id: str
+    status: str
+    done: int
+    total: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+class LdaTrainIn(BaseModel):
+    """
+    Input: corpus_id (str), texts (List[str]), num_topics (int), passes (int)
+    Output: BaseModel
+    corpus_id is a benchmark_id, or "default" for the fallback model
+    """
+    corpus_id: str
+    texts: List[str]
+    num_topics: int = 5
+    passes: int = 10
+
+class LdaTrainOut(BaseModel):
+    """
+    Input: status (str), corpus_id (str), num_topics (int), num_documents (int), vocab_size (int), elapsed_time_sec (float)
+    Output: BaseModel
+    """
+    status: str
+    corpus_id: str
+    num_topics: int
+    num_documents: int
+    vocab_size: int
+    elapsed_time_sec: float
@@ -1,103 +1,128 @@
 # connectives and pronouns
 
-import re
+from .text_context import build_text_context
 
 
-def calculate_connective_density(text: str, connectives=None) -> float:
+def _category_count(ctx, lexicon_index, lexicon, category: str) -> int:
+    # one fused pass via the lexicon index when available, otherwise scan the words
+    if lexicon_index is not None:
+        return ctx.category_counts(lexicon_index)[category]
+    return sum(1 for word in ctx.words_lower if word in lexicon[category])
+
+
+def calculate_connective_density(text: str, connectives=None, ctx=None, lexicon_index=None) -> float:
     # connective density using o(1) lookup
     if not text or not text.strip():
         return 0.0
     
-    if connectives is None:
+    if connectives is None and lexicon_index is None:
         raise ValueError("connectives parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    connective_count = sum(1 for word in words if word in connectives["all_connectives"])
+    connective_count = _category_count(ctx, lexicon_index, connectives, "all_connectives")
     return connective_count / len(words)
 
 
-def calculate_pronoun_density(text: str, pronouns=None) -> float:
+def calculate_pronoun_density(text: str, pronouns=None, ctx=None, lexicon_index=None) -> float:
     """
     same
     """
     if not text or not text.strip():
         return 0.0
     
-    if pronouns is None:
+    if pronouns is None and lexicon_index is None:
         raise ValueError("pronouns parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    pronoun_count = sum(1 for word in words if word in pronouns["all_pronouns"])
+    pronoun_count = _category_count(ctx, lexicon_index, pronouns, "all_pronouns")
     return pronoun_count / len(words)
 
 
-def calculate_first_person_pronoun_ratio(text: str, pronouns=None) -> float:
+def calculate_first_person_pronoun_ratio(text: str, pronouns=None, ctx=None, lexicon_index=None) -> float:
     if not text or not text.strip():
         return 0.0
     
-    if pronouns is None:
+    if pronouns is None and lexicon_index is None:
         raise ValueError("pronouns parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    first_person_count = sum(1 for word in words if word in pronouns["first_person"])
+    first_person_count = _category_count(ctx, lexicon_index, pronouns, "first_person")
     return first_person_count / len(words)
 
 
-def calculate_second_person_pronoun_ratio(text: str, pronouns=None) -> float:
+def calculate_second_person_pronoun_ratio(text: str, pronouns=None, ctx=None, lexicon_index=None) -> float:
     if not text or not text.strip():
         return 0.0
     
-    if pronouns is None:
+    if pronouns is None and lexicon_index is None:
         raise ValueError("pronouns parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    second_person_count = sum(1 for word in words if word in pronouns["second_person"])
+    second_person_count = _category_count(ctx, lexicon_index, pronouns, "second_person")
     return second_person_count / len(words)
 
 
-def calculate_third_person_pronoun_ratio(text: str, pronouns=None) -> float:
+def calculate_third_person_pronoun_ratio(text: str, pronouns=None, ctx=None, lexicon_index=None) -> float:
     if not text or not text.strip():
         return 0.0
     
-    if pronouns is None:
+    if pronouns is None and lexicon_index is None:
         raise ValueError("pronouns parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    third_person_count = sum(1 for word in words if word in pronouns["third_person"])
+    third_person_count = _category_count(ctx, lexicon_index, pronouns, "third_person")
     return third_person_count / len(words)
 
 
-def calculate_causal_connective_ratio(text: str, connectives=None) -> float:
+def calculate_causal_connective_ratio(text: str, connectives=None, ctx=None, lexicon_index=None) -> float:
     if not text or not text.strip():
         return 0.0
     
-    if connectives is None:
+    if connectives is None and lexicon_index is None:
         raise ValueError("connectives parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    causal_count = sum(1 for word in words if word in connectives["causal"])
+    causal_count = _category_count(ctx, lexicon_index, connectives, "causal")
     return causal_count / len(words)
 
 
-def calculate_connective_ratios(text: str, connectives=None) -> dict:
+def calculate_connective_ratios(text: str, connectives=None, ctx=None, lexicon_index=None) -> dict:
     if not text or not text.strip():
         return {
             "coordinating_connective_ratio": 0.0,
@@ -105,10 +130,13 @@ def calculate_connective_ratios(text: str, connectives=None) -> dict:
             "causal_connective_ratio": 0.0
         }
     
-    if connectives is None:
+    if connectives is None and lexicon_index is None:
         raise ValueError("connectives parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return {
             "coordinating_connective_ratio": 0.0,
@@ -117,9 +145,9 @@ def calculate_connective_ratios(text: str, connectives=None) -> dict:
         }
 
     total_words = len(words)
-    coordinating_count = sum(1 for word in words if word in connectives["coordinating"])
-    subordinating_count = sum(1 for word in words if word in connectives["subordinating"])
-    causal_count = sum(1 for word in words if word in connectives["causal"])
+    coordinating_count = _category_count(ctx, lexicon_index, connectives, "coordinating")
+    subordinating_count = _category_count(ctx, lexicon_index, connectives, "subordinating")
+    causal_count = _category_count(ctx, lexicon_index, connectives, "causal")
 
     return {
         "coordinating_connective_ratio": coordinating_count / total_words,
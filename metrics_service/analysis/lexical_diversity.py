@@ -7,19 +7,23 @@ TTR
 moving average TTR
 """
 
-import re
-from typing import Dict, Set
+from typing import Dict, Iterable, Set
 
+from .text_context import build_text_context
 
-def calculate_lexical_density(text: str, doc=None, nlp=None) -> float:
+
+def calculate_lexical_density(text: str, doc=None, nlp=None, ctx=None) -> float:
     if not text or not text.strip():
         return 0.0
     
-    if doc is None:
-        if nlp is None:
-            raise ValueError("Either doc or nlp parameter is required")
-        doc = nlp(text)
-    words = [token.text for token in doc if token.is_alpha]
+    if ctx is not None:
+        words = [token.text for token in ctx.tokens]
+    else:
+        if doc is None:
+            if nlp is None:
+                raise ValueError("Either doc, nlp or ctx parameter is required")
+            doc = nlp(text)
+        words = [token.text for token in doc if token.is_alpha]
     if not words:
         return 0.0
 
@@ -29,14 +33,17 @@ def calculate_lexical_density(text: str, doc=None, nlp=None) -> float:
     return lexical_density
 
 
-def calculate_inflectional_diversity(text: str, form_to_lemma=None) -> float:
+def calculate_inflectional_diversity(text: str, form_to_lemma=None, ctx=None) -> float:
     if not text or not text.strip():
         return 0.0
     
     if form_to_lemma is None:
         raise ValueError("form_to_lemma parameter is required")
 
-    words = [w.lower() for w in re.findall(r"\b[a-zA-ZæøåÆØÅ]+\b", text)]
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = [w.lower() for w in ctx.tokenized.bounded_words()]
     lemma_usage: Dict[str, Set[str]] = {}
 
     for word in words:
@@ -51,50 +58,88 @@ def calculate_inflectional_diversity(text: str, form_to_lemma=None) -> float:
     return total_forms / len(lemma_usage)
 
 
-def calculate_hapax_legomena_ratio(text: str) -> float:
+def calculate_hapax_legomena_ratio(text: str, ctx=None) -> float:
     # words appearing exactly once
     if not text or not text.strip():
         return 0.0
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    freq = {}
-    for w in words:
-        freq[w] = freq.get(w, 0) + 1
+    freq = ctx.word_counts
 
     hapax_count = sum(1 for count in freq.values() if count == 1)
     return hapax_count / len(words)
 
 
-def calculate_ttr(text: str) -> float:
+def calculate_ttr(text: str, ctx=None) -> float:
     # type-token ratio
     if not text or not text.strip():
         return 0.0
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    unique_words = set(words)
-    return len(unique_words) / len(words)
+    return len(ctx.word_counts) / len(words)
 
 
-def calculate_moving_average_ttr(text: str, window_size: int = 100) -> float:
+def calculate_moving_average_ttr(text: str, window_size: int = 100, ctx=None) -> float:
     # moving average TTR
-    if not text or not text.strip():
-        return 0.0
+    return calculate_moving_average_ttrs(text, (window_size,), ctx=ctx)[window_size]
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
-    if len(words) < window_size:
-        return calculate_ttr(text)
 
-    ttrs = []
-    for i in range(len(words) - window_size + 1):
-        window_words = words[i:i + window_size]
-        unique_words = set(window_words)
-        ttr = len(unique_words) / len(window_words)
-        ttrs.append(ttr)
-
-    return sum(ttrs) / len(ttrs) if ttrs else 0.0
\ No newline at end of file
+def calculate_moving_average_ttrs(text: str, window_sizes: Iterable[int] = (50, 100, 200), ctx=None) -> Dict[int, float]:
+    """
+    MATTR for several window sizes in one pass over the words.
+    Each window keeps a running count per word and a distinct-type counter,
+    so sliding one step is O(1) instead of rebuilding a set per window.
+    Texts shorter than a window fall back to plain TTR for that window.
+    """
+    window_sizes = list(window_sizes)
+    if not text or not text.strip():
+        return {w: 0.0 for w in window_sizes}
+
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
+    results = {w: calculate_ttr(text, ctx=ctx) for w in window_sizes if len(words) < w}
+    windows = [w for w in window_sizes if w not in results]
+    if not windows:
+        return results
+
+    counts = {w: {} for w in windows}
+    distinct = dict.fromkeys(windows, 0)
+    ttr_sums = dict.fromkeys(windows, 0.0)
+
+    for i, word in enumerate(words):
+        for w in windows:
+            window_counts = counts[w]
+            n = window_counts.get(word, 0)
+            if n == 0:
+                distinct[w] += 1
+            window_counts[word] = n + 1
+
+            if i >= w:
+                old = words[i - w]
+                n = window_counts[old] - 1
+                if n == 0:
+                    del window_counts[old]
+                    distinct[w] -= 1
+                else:
+                    window_counts[old] = n
+
+            if i >= w - 1:
+                ttr_sums[w] += distinct[w] / w
+
+    for w in windows:
+        results[w] = ttr_sums[w] / (len(words) - w + 1)
+    return results
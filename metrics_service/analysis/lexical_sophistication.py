@@ -1,14 +1,17 @@
 # lexical sophistication metrics
 
-import re
+from .text_context import build_text_context
 
 
-def calculate_long_word_ratio(text: str) -> float:
+def calculate_long_word_ratio(text: str, ctx=None) -> float:
     # ratio of long words (>=7 chars)
     if not text or not text.strip():
         return 0.0
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text)
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words
     if not words:
         return 0.0
 
@@ -16,11 +19,14 @@ def calculate_long_word_ratio(text: str) -> float:
     return len(long_words) / len(words)
 
 
-def calculate_avg_word_length(text: str) -> float:
+def calculate_avg_word_length(text: str, ctx=None) -> float:
     if not text or not text.strip():
         return 0.0
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text)
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words
     if not words:
         return 0.0
 
@@ -0,0 +1,65 @@
+# precompiled word -> category bitmask for the cohesion and content-word metrics
+
+from collections import defaultdict
+from typing import Dict
+
+
+# category names match the keys in pronouns.pkl, connectives.pkl and pos_categories.pkl
+PRONOUN_CATEGORIES = ["first_person", "second_person", "third_person", "all_pronouns"]
+CONNECTIVE_CATEGORIES = ["causal", "coordinating", "subordinating", "temporal", "conditional", "all_connectives"]
+POS_CATEGORIES = ["content_words", "function_words"]
+
+CATEGORIES = PRONOUN_CATEGORIES + CONNECTIVE_CATEGORIES + POS_CATEGORIES
+CATEGORY_BITS = {name: 1 << i for i, name in enumerate(CATEGORIES)}
+
+
+class LexiconIndex:
+    """
+    Maps each word form to a bitmask of the categories it belongs to, so all
+    category counts for a text come from one pass over its word frequencies.
+
+    Pronoun and connective masks are precomputed in a small dict. The content
+    and function word lists are large, so those stay as the loaded sets and are
+    checked once per distinct word instead of being copied into the dict.
+    """
+
+    def __init__(self, pronouns: dict, connectives: dict, pos_categories: dict):
+        self.masks: Dict[str, int] = {}
+        for name in PRONOUN_CATEGORIES:
+            self._add(pronouns[name], CATEGORY_BITS[name])
+        for name in CONNECTIVE_CATEGORIES:
+            self._add(connectives[name], CATEGORY_BITS[name])
+
+        self.content_words = pos_categories["content_words"]
+        self.function_words = pos_categories.get("function_words", set())
+
+    def _add(self, words, bit: int) -> None:
+        for word in words:
+            self.masks[word] = self.masks.get(word, 0) | bit
+
+    def mask(self, word: str) -> int:
+        mask = self.masks.get(word, 0)
+        if word in self.content_words:
+            mask |= CATEGORY_BITS["content_words"]
+        if word in self.function_words:
+            mask |= CATEGORY_BITS["function_words"]
+        return mask
+
+    def count_categories(self, word_counts) -> Dict[str, int]:
+        # word_counts: word -> frequency (e.g. a Counter of lowercase words)
+        mask_totals = defaultdict(int)
+        for word, count in word_counts.items():
+            mask = self.mask(word)
+            if mask:
+                mask_totals[mask] += count
+
+        counts = dict.fromkeys(CATEGORIES, 0)
+        for mask, total in mask_totals.items():
+            for name, bit in CATEGORY_BITS.items():
+                if mask & bit:
+                    counts[name] += total
+        return counts
+
+
+def build_lexicon_index(pronouns: dict, connectives: dict, pos_categories: dict) -> LexiconIndex:
+    return LexiconIndex(pronouns, connectives, pos_categories)
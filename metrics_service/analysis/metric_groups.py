@@ -0,0 +1,176 @@
+# which spaCy annotations each metric needs, and the smallest pipeline that provides them
+
+from typing import FrozenSet, Iterable, List, Optional
+
+
+# annotations a metric can depend on
+TOKENS = "tokens"        # tokenizer output: token count, is_alpha words
+SENTENCES = "sentences"  # sentence boundaries (senter, or the parser in "full")
+POS = "pos"              # coarse POS tags (morphologizer / tagger + attribute_ruler)
+
+# metric (as computed in compute_text_metrics) -> annotations it reads from the doc;
+# metrics with an empty set only use the regex tokenization and the lexicons
+METRIC_REQUIREMENTS = {
+    # Lexical diversity
+    "lexical_density": {TOKENS},
+    "inflectional_diversity": set(),
+    "hapax_legomena_ratio": set(),
+    "ttr": set(),
+    "moving_average_ttr": set(),
+    # Lexical sophistication
+    "long_word_ratio": set(),
+    "avg_word_length_lexical": set(),
+    # Readability
+    "lix": set(),
+    "sentence_length_std_dev": {TOKENS, SENTENCES},
+    # Syntactic complexity
+    "pos_ratios": {TOKENS, POS},
+    "noun_ratio": {TOKENS, POS},
+    "adjective_ratio": {TOKENS, POS},
+    "content_word_ratio": set(),
+    # Text productivity
+    "sentence_metrics": {TOKENS, SENTENCES},
+    "token_count": {TOKENS},
+    "word_count": {TOKENS},
+    "sentence_count": {SENTENCES},
+    "avg_sentence_length": {TOKENS, SENTENCES},
+    # Orthography and formatting
+    "spelling_mistakes": set(),
+    "capitalization_ratio": set(),
+    "uppercase_letter_ratio": set(),
+    "lowercase_letter_ratio": set(),
+    "digits_ratio": set(),
+    # Punctuation mechanics
+    "punctuation_density": set(),
+    "punctuation_counts": set(),
+    "punctuation_diversity": set(),
+    # Cohesion and discourse
+    "connective_density": set(),
+    "pronoun_density": set(),
+    "first_person_pronoun_ratio": set(),
+    "second_person_pronoun_ratio": set(),
+    "third_person_pronoun_ratio": set(),
+    "causal_connective_ratio": set(),
+    "connective_ratios": set(),
+}
+
+# metric groups, named after their category scores (<group>_score)
+METRIC_GROUPS = {
+    "lexical_diversity": ["lexical_density", "inflectional_diversity", "hapax_legomena_ratio", "ttr", "moving_average_ttr"],
+    "lexical_sophistication": ["long_word_ratio", "avg_word_length_lexical"],
+    "readability": ["lix", "sentence_length_std_dev"],
+    "syntactic_complexity": ["pos_ratios", "noun_ratio", "adjective_ratio", "content_word_ratio"],
+    "text_productivity": ["sentence_metrics", "token_count", "word_count", "sentence_count", "avg_sentence_length"],
+    "orthography_formatting": ["spelling_mistakes", "capitalization_ratio", "uppercase_letter_ratio", "lowercase_letter_ratio", "digits_ratio"],
+    "punctuation_mechanics": ["punctuation_density", "punctuation_counts", "punctuation_diversity"],
+    "cohesion_discourse": [
+        "connective_density", "pronoun_density", "first_person_pronoun_ratio", "second_person_pronoun_ratio",
+        "third_person_pronoun_ratio", "causal_connective_ratio", "connective_ratios",
+    ],
+}
+
+# output keys that differ from the metric that produces them
+METRIC_ALIASES = {
+    "spelling_error_count": "spelling_mistakes",
+    "moving_average_ttr_50": "moving_average_ttr",
+    "moving_average_ttr_200": "moving_average_ttr",
+    "var_sentence_length": "sentence_metrics",
+    "avg_word_length": "sentence_metrics",
+}
+
+
+def expand_metrics(names: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """
+    Resolve a request's metric list (group names, metric names or output
+    keys) to the set of metrics to compute. None means the full suite.
+    Raises ValueError on unknown names.
+    """
+    if names is None:
+        return None
+    selected = set()
+    unknown = []
+    for name in names:
+        if name in METRIC_GROUPS:
+            selected.update(METRIC_GROUPS[name])
+        elif name in METRIC_REQUIREMENTS:
+            selected.add(name)
+        elif name in METRIC_ALIASES:
+            selected.add(METRIC_ALIASES[name])
+        else:
+            unknown.append(name)
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}; expected groups {sorted(METRIC_GROUPS)} or metric names")
+    return frozenset(selected)
+
+
+def complete_groups(metrics: Optional[Iterable[str]] = None) -> List[str]:
+    # groups whose metrics are all selected, so their category score can be computed
+    if metrics is None:
+        return list(METRIC_GROUPS)
+    selected = set(metrics)
+    return [group for group, names in METRIC_GROUPS.items() if selected.issuperset(names)]
+
+
+# profile -> (annotations provided, components kept besides shared embedding layers)
+PIPELINE_PROFILES = {
+    "tokens": ({TOKENS}, set()),
+    "senter": ({TOKENS, SENTENCES}, {"senter", "sentencizer"}),
+    "tagger": ({TOKENS, SENTENCES, POS}, {"morphologizer", "tagger", "attribute_ruler", "senter", "sentencizer"}),
+    # sentence boundaries from the dependency parser, as before profiles existed
+    "full": ({TOKENS, SENTENCES, POS}, {"morphologizer", "tagger", "attribute_ruler", "parser", "sentencizer"}),
+}
+
+# cheapest first; "full" is only used when configured explicitly
+PROFILE_ORDER = ["tokens", "senter", "tagger"]
+
+
+def required_annotations(metrics: Optional[Iterable[str]] = None) -> set:
+    # union of the requirements of the given metrics (all metrics when None)
+    names = METRIC_REQUIREMENTS if metrics is None else metrics
+    needed = set()
+    for name in names:
+        needed |= METRIC_REQUIREMENTS[name]
+    return needed
+
+
+def select_profile(metrics: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Smallest pipeline profile covering the metrics, or None when none of
+    them needs spaCy at all.
+    """
+    needed = required_annotations(metrics)
+    if not needed:
+        return None
+    for profile in PROFILE_ORDER:
+        if needed <= PIPELINE_PROFILES[profile][0]:
+            return profile
+    raise ValueError(f"No pipeline profile provides {sorted(needed)}")
+
+
+def resolve_profile(configured: str, metrics: Optional[Iterable[str]] = None) -> Optional[str]:
+    # "auto" picks the minimal profile; a named profile is used as long as it covers the metrics.
+    # Metrics that need no annotations skip spaCy (None) either way.
+    if not required_annotations(metrics):
+        return None
+    if configured == "auto":
+        return select_profile(metrics)
+    if configured not in PIPELINE_PROFILES:
+        raise ValueError(f"Unknown pipeline profile '{configured}', expected auto or one of {sorted(PIPELINE_PROFILES)}")
+    missing = required_annotations(metrics) - PIPELINE_PROFILES[configured][0]
+    if missing:
+        raise ValueError(f"Pipeline profile '{configured}' does not provide {sorted(missing)}")
+    return configured
+
+
+def profile_disable(nlp, profile: str) -> List[str]:
+    """
+    Components to disable for one nlp()/nlp.pipe() call so only the profile
+    runs. Shared embedding layers (tok2vec) stay on while a kept component
+    listens to them.
+    """
+    keep = PIPELINE_PROFILES[profile][1] & set(nlp.pipe_names)
+    for name, component in nlp.pipeline:
+        listeners = getattr(component, "listening_components", None)
+        if listeners and keep & set(listeners):
+            keep.add(name)
+    return [name for name in nlp.pipe_names if name not in keep]
@@ -1,16 +1,21 @@
 # File: analysis/orchestrate_text_metrics.py
 # Part of: text-analysis project
 
-import re
 import math
 
+# Shared per-text context (one spaCy parse per text)
+from .text_context import TextContext, build_text_context
+
+# Smallest spaCy pipeline profile for the requested metrics
+from .metric_groups import select_profile, profile_disable, complete_groups
+
 # Lexical diversity functions
 from .lexical_diversity import (
     calculate_lexical_density,
     calculate_inflectional_diversity,
     calculate_hapax_legomena_ratio,
     calculate_ttr,
-    calculate_moving_average_ttr
+    calculate_moving_average_ttrs
 )
 
 # Lexical sophistication functions
@@ -69,6 +74,13 @@ from .cohesion_discourse import (
     calculate_connective_ratios
 )
 
+# Bump when metric definitions or output keys change; part of the result cache key
+METRICS_VERSION = "3"
+
+# MATTR resolutions reported per text; the default window feeds "moving_average_ttr"
+MATTR_WINDOW_SIZES = (50, 100, 200)
+MATTR_DEFAULT_WINDOW = 100
+
 # Score calculation functions (keeping these for now as requested)
 
 
@@ -80,168 +92,220 @@ def normalize_score(values):
     return 1 / (1 + math.exp(-avg))
 
 
-def return_text_metrics(text: str, resources=None) -> dict:
-    # text metrics suite
+def return_text_metrics(text: str, resources=None, profile: str = "auto", metrics=None) -> dict:
+    # text metrics suite (or the `metrics` subset) for a single text
+    
+    if resources is None:
+        raise ValueError("resources parameter is required")
     
+    nlp = resources[0]
+    if profile == "auto":
+        profile = select_profile(metrics)
+    
+    # SINGLE spaCy processing - build the shared context ONCE and pass it everywhere;
+    # no parse at all when the profile is None
+    if profile is None:
+        ctx = build_text_context(text)
+    else:
+        ctx = build_text_context(text, nlp, disable=profile_disable(nlp, profile))
+    return compute_text_metrics(ctx, resources, metrics)
+
+
+def iter_text_metrics(texts, resources=None, batch_size: int = 32, profile: str = "auto", metrics=None):
+    """
+    Batch path: parse every text with nlp.pipe and yield the metric suite
+    (or the `metrics` subset) for each one, in input order. Empty texts are
+    not sent to spaCy. Only the components of `profile` run ("auto": the
+    minimal profile for the metrics); with profile None spaCy is skipped.
+    """
     if resources is None:
         raise ValueError("resources parameter is required")
     
-    nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, meta = resources
+    nlp = resources[0]
+    if profile == "auto":
+        profile = select_profile(metrics)
+    texts = list(texts)
+    if profile is None:
+        for text in texts:
+            yield compute_text_metrics(TextContext(text), resources, metrics)
+        return
+    
+    docs = nlp.pipe(
+        (t for t in texts if t and t.strip()),
+        batch_size=batch_size,
+        disable=profile_disable(nlp, profile),
+    )
+    
+    for text in texts:
+        doc = next(docs) if text and text.strip() else None
+        yield compute_text_metrics(TextContext(text, doc), resources, metrics)
+
+
+def compute_text_metrics(ctx: TextContext, resources=None, metrics=None) -> dict:
+    """
+    Text metrics suite on an already parsed context. `metrics` is a set of
+    metric names (see metric_groups.METRIC_REQUIREMENTS); None computes all
+    of them. Only category scores whose metrics were all computed are returned.
+    """
+    
+    if resources is None:
+        raise ValueError("resources parameter is required")
     
-    # SINGLE spaCy processing - do this ONCE and reuse everywhere
-    doc = nlp(text) if text and text.strip() else None
+    nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, lexicon_index, meta = resources
     
-    # Pre-compute common data structures for reuse
-    words_lower = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower()) if text else []
-    tokens = [token for token in doc if token.is_alpha] if doc else []
-    sentences = list(doc.sents) if doc else []
+    text = ctx.text
+    doc = ctx.doc
+    want = (lambda name: True) if metrics is None else metrics.__contains__
+    # output in the same key order as the full suite
+    out = {}
     
-    # Lexical diversity metrics - using doc where possible, otherwise text
-    lexical_density = calculate_lexical_density(text, doc=doc) if doc else 0.0
-    inflectional_diversity = calculate_inflectional_diversity(text, form_to_lemma)
-    hapax_legomena_ratio = calculate_hapax_legomena_ratio(text)
-    ttr = calculate_ttr(text)
-    moving_average_ttr = calculate_moving_average_ttr(text)
+    # Lexical diversity metrics - all read from the shared context
+    if want("lexical_density"):
+        out["lexical_density"] = calculate_lexical_density(text, ctx=ctx) if doc else 0.0
+    if want("inflectional_diversity"):
+        out["inflectional_diversity"] = calculate_inflectional_diversity(text, form_to_lemma, ctx=ctx)
+    if want("hapax_legomena_ratio"):
+        out["hapax_legomena_ratio"] = calculate_hapax_legomena_ratio(text, ctx=ctx)
+    if want("ttr"):
+        out["ttr"] = calculate_ttr(text, ctx=ctx)
+    if want("moving_average_ttr"):
+        moving_average_ttrs = calculate_moving_average_ttrs(text, MATTR_WINDOW_SIZES, ctx=ctx)
+        out["moving_average_ttr"] = moving_average_ttrs[MATTR_DEFAULT_WINDOW]
+        out.update({
+            f"moving_average_ttr_{w}": value
+            for w, value in moving_average_ttrs.items()
+            if w != MATTR_DEFAULT_WINDOW
+        })
     
-    # Lexical sophistication metrics - pure regex, no spaCy needed
-    long_word_ratio = calculate_long_word_ratio(text)
-    avg_word_length = calculate_avg_word_length(text)
+    # Lexical sophistication metrics - shared tokenization, no spaCy needed
+    if want("long_word_ratio"):
+        out["long_word_ratio"] = calculate_long_word_ratio(text, ctx=ctx)
+    if want("avg_word_length_lexical"):
+        # regex words; "avg_word_length" is the spaCy-based value from sentence_metrics
+        out["avg_word_length_lexical"] = calculate_avg_word_length(text, ctx=ctx)
     
     # Readability metrics - mix of regex and spaCy
-    lix = calculate_lix(text)
-    sentence_length_std_dev = calculate_sentence_length_std_dev(text, nlp) if doc else 0.0
+    if want("lix"):
+        out["lix"] = calculate_lix(text, ctx=ctx)
+    if want("sentence_length_std_dev"):
+        out["sentence_length_std_dev"] = calculate_sentence_length_std_dev(text, ctx=ctx) if doc else 0.0
     
     # Syntactic complexity metrics - mix of spaCy and O(1) lookups
-    pos_ratios = calculate_pos_ratios(text, nlp) if doc else {}
-    noun_ratio = calculate_noun_ratio(text, nlp) if doc else 0.0
-    adjective_ratio = calculate_adjective_ratio(text, nlp) if doc else 0.0
-    content_word_ratio = calculate_content_word_ratio(text, pos_categories)
-    
-    # Text productivity metrics - using doc
-    sentence_metrics = calculate_sentence_metrics(text, nlp) if doc else {"avg_sentence_length": 0.0, "var_sentence_length": 0.0, "avg_word_length": 0.0}
-    token_count = len(doc) if doc else 0
-    word_count = len(tokens)
-    sentence_count = len(sentences)
-    avg_sentence_length = sentence_metrics["avg_sentence_length"]
+    pos_ratios = {}
+    if want("pos_ratios"):
+        pos_ratios = calculate_pos_ratios(text, ctx=ctx) if doc else {}
+        out.update(pos_ratios)
+    if want("noun_ratio"):
+        out["noun_ratio"] = calculate_noun_ratio(text, ctx=ctx) if doc else 0.0
+    if want("adjective_ratio"):
+        out["adjective_ratio"] = calculate_adjective_ratio(text, ctx=ctx) if doc else 0.0
+    if want("content_word_ratio"):
+        out["content_word_ratio"] = calculate_content_word_ratio(text, pos_categories, ctx=ctx, lexicon_index=lexicon_index)
+    
+    # Text productivity metrics - using the shared doc
+    sentence_metrics = {}
+    if want("sentence_metrics") or want("avg_sentence_length"):
+        sentence_metrics = calculate_sentence_metrics(text, ctx=ctx) if doc else {"avg_sentence_length": 0.0, "var_sentence_length": 0.0, "avg_word_length": 0.0}
+    if want("sentence_metrics"):
+        out.update(sentence_metrics)
+    if want("token_count"):
+        out["token_count"] = len(doc) if doc else 0
+    if want("word_count"):
+        out["word_count"] = len(ctx.tokens)
+    if want("sentence_count"):
+        out["sentence_count"] = len(ctx.sentences)
+    if want("avg_sentence_length"):
+        out["avg_sentence_length"] = sentence_metrics["avg_sentence_length"]
     
     # Orthography and formatting metrics - no spaCy needed
-    spelling_mistakes = find_spelling_mistakes(text, wordbank)
-    capitalization_ratio = calculate_capitalization_ratio(text)
-    uppercase_letter_ratio = calculate_uppercase_letter_ratio(text)
-    lowercase_letter_ratio = calculate_lowercase_letter_ratio(text)
-    digits_ratio = calculate_digits_ratio(text)
+    if want("spelling_mistakes"):
+        spelling_mistakes = find_spelling_mistakes(text, wordbank, ctx=ctx)
+        out["spelling_error_count"] = spelling_mistakes["spelling_error_count"]
+    if want("capitalization_ratio"):
+        out["capitalization_ratio"] = calculate_capitalization_ratio(text, ctx=ctx)
+    if want("uppercase_letter_ratio"):
+        out["uppercase_letter_ratio"] = calculate_uppercase_letter_ratio(text)
+    if want("lowercase_letter_ratio"):
+        out["lowercase_letter_ratio"] = calculate_lowercase_letter_ratio(text)
+    if want("digits_ratio"):
+        out["digits_ratio"] = calculate_digits_ratio(text)
     
     # Punctuation mechanics metrics - no spaCy needed
-    punctuation_density = calculate_punctuation_density(text)
-    punctuation_counts = calculate_punctuation_counts(text)
-    punctuation_diversity = calculate_punctuation_diversity(text)
-    
-    # Cohesion and discourse metrics - using O(1) lookups instead of spaCy!
-    connective_density = calculate_connective_density(text, connectives)
-    pronoun_density = calculate_pronoun_density(text, pronouns)
-    first_person_pronoun_ratio = calculate_first_person_pronoun_ratio(text, pronouns)
-    second_person_pronoun_ratio = calculate_second_person_pronoun_ratio(text, pronouns)
-    third_person_pronoun_ratio = calculate_third_person_pronoun_ratio(text, pronouns)
-    causal_connective_ratio = calculate_causal_connective_ratio(text, connectives)
-    connective_ratios = calculate_connective_ratios(text, connectives)
+    punctuation_counts = {}
+    if want("punctuation_density"):
+        out["punctuation_density"] = calculate_punctuation_density(text)
+    if want("punctuation_counts"):
+        punctuation_counts = calculate_punctuation_counts(text)
+        out.update(punctuation_counts)
+    if want("punctuation_diversity"):
+        out["punctuation_diversity"] = calculate_punctuation_diversity(text)
+    
+    # Cohesion and discourse metrics - one fused pass over the word counts via the lexicon index
+    connective_ratios = {}
+    if want("connective_density"):
+        out["connective_density"] = calculate_connective_density(text, connectives, ctx=ctx, lexicon_index=lexicon_index)
+    if want("pronoun_density"):
+        out["pronoun_density"] = calculate_pronoun_density(text, pronouns, ctx=ctx, lexicon_index=lexicon_index)
+    if want("first_person_pronoun_ratio"):
+        out["first_person_pronoun_ratio"] = calculate_first_person_pronoun_ratio(text, pronouns, ctx=ctx, lexicon_index=lexicon_index)
+    if want("second_person_pronoun_ratio"):
+        out["second_person_pronoun_ratio"] = calculate_second_person_pronoun_ratio(text, pronouns, ctx=ctx, lexicon_index=lexicon_index)
+    if want("third_person_pronoun_ratio"):
+        out["third_person_pronoun_ratio"] = calculate_third_person_pronoun_ratio(text, pronouns, ctx=ctx, lexicon_index=lexicon_index)
+    if want("causal_connective_ratio"):
+        out["causal_connective_ratio"] = calculate_causal_connective_ratio(text, connectives, ctx=ctx, lexicon_index=lexicon_index)
+    if want("connective_ratios"):
+        connective_ratios = calculate_connective_ratios(text, connectives, ctx=ctx, lexicon_index=lexicon_index)
+        out.update(connective_ratios)
     
     # Category scores - normalized with sigmoid to 0-1 range
-    cohesion_discourse_score = normalize_score([
-        connective_density, pronoun_density, first_person_pronoun_ratio,
-        second_person_pronoun_ratio, third_person_pronoun_ratio,
-        causal_connective_ratio
-    ] + list(connective_ratios.values()))
-    
-    lexical_diversity_score = normalize_score([
-        lexical_density, inflectional_diversity, hapax_legomena_ratio,
-        ttr, moving_average_ttr
-    ])
-    
-    lexical_sophistication_score = normalize_score([
-        long_word_ratio, avg_word_length
-    ])
-    
-    readability_score = normalize_score([
-        lix, sentence_length_std_dev
-    ])
-    
-    syntactic_complexity_score = normalize_score([
-        noun_ratio, adjective_ratio, content_word_ratio
-    ] + list(pos_ratios.values()))
-    
-    text_productivity_score = normalize_score([
-        token_count, word_count, sentence_count, avg_sentence_length
-    ] + list(sentence_metrics.values()))
-    
-    # For orthography - invert spelling error rate (higher errors = lower score)
-    spelling_error_rate = spelling_mistakes["spelling_error_count"] / max(1, spelling_mistakes["total_amount_of_words"])
-    orthography_formatting_score = normalize_score([
-        capitalization_ratio, uppercase_letter_ratio, lowercase_letter_ratio,
-        digits_ratio, 1 - spelling_error_rate
-    ])
-    
-    punctuation_mechanics_score = normalize_score([
-        punctuation_density, punctuation_diversity
-    ] + list(punctuation_counts.values()))
-    return {
-        "metrics": {
-            # Lexical diversity
-            "lexical_density": lexical_density,
-            "inflectional_diversity": inflectional_diversity,
-            "hapax_legomena_ratio": hapax_legomena_ratio,
-            "ttr": ttr,
-            "moving_average_ttr": moving_average_ttr,
-            
-            # Lexical sophistication
-            "long_word_ratio": long_word_ratio,
-            "avg_word_length": avg_word_length,
-            
-            # Readability
-            "lix": lix,
-            "sentence_length_std_dev": sentence_length_std_dev,
-            
-            # Syntactic complexity
-            **pos_ratios,
-            "noun_ratio": noun_ratio,
-            "adjective_ratio": adjective_ratio,
-            "content_word_ratio": content_word_ratio,
-            
-            # Text productivity
-            **sentence_metrics,
-            "token_count": token_count,
-            "word_count": word_count,
-            "sentence_count": sentence_count,
-            "avg_sentence_length": avg_sentence_length,
-            
-            # Orthography and formatting
-            "spelling_error_count": spelling_mistakes["spelling_error_count"],
-            "capitalization_ratio": capitalization_ratio,
-            "uppercase_letter_ratio": uppercase_letter_ratio,
-            "lowercase_letter_ratio": lowercase_letter_ratio,
-            "digits_ratio": digits_ratio,
-            
-            # Punctuation mechanics
-            "punctuation_density": punctuation_density,
-            **punctuation_counts,
-            "punctuation_diversity": punctuation_diversity,
-            
-            # Cohesion and discourse
-            "connective_density": connective_density,
-            "pronoun_density": pronoun_density,
-            "first_person_pronoun_ratio": first_person_pronoun_ratio,
-            "second_person_pronoun_ratio": second_person_pronoun_ratio,
-            "third_person_pronoun_ratio": third_person_pronoun_ratio,
-            "causal_connective_ratio": causal_connective_ratio,
-            **connective_ratios,
-        },
-        "scores": {
-            "cohesion_discourse_score": cohesion_discourse_score,
-            "lexical_diversity_score": lexical_diversity_score,
-            "lexical_sophistication_score": lexical_sophistication_score,
-            "readability_score": readability_score,
-            "syntactic_complexity_score": syntactic_complexity_score,
-            "text_productivity_score": text_productivity_score,
-            "orthography_formatting_score": orthography_formatting_score,
-            "punctuation_mechanics_score": punctuation_mechanics_score,
-        },
-    }
\ No newline at end of file
+    groups = set(complete_groups(metrics))
+    scores = {}
+    
+    if "cohesion_discourse" in groups:
+        scores["cohesion_discourse_score"] = normalize_score([
+            out["connective_density"], out["pronoun_density"], out["first_person_pronoun_ratio"],
+            out["second_person_pronoun_ratio"], out["third_person_pronoun_ratio"],
+            out["causal_connective_ratio"]
+        ] + list(connective_ratios.values()))
+    
+    if "lexical_diversity" in groups:
+        scores["lexical_diversity_score"] = normalize_score([
+            out["lexical_density"], out["inflectional_diversity"], out["hapax_legomena_ratio"],
+            out["ttr"], out["moving_average_ttr"]
+        ])
+    
+    if "lexical_sophistication" in groups:
+        scores["lexical_sophistication_score"] = normalize_score([
+            out["long_word_ratio"], out["avg_word_length_lexical"]
+        ])
+    
+    if "readability" in groups:
+        scores["readability_score"] = normalize_score([
+            out["lix"], out["sentence_length_std_dev"]
+        ])
+    
+    if "syntactic_complexity" in groups:
+        scores["syntactic_complexity_score"] = normalize_score([
+            out["noun_ratio"], out["adjective_ratio"], out["content_word_ratio"]
+        ] + list(pos_ratios.values()))
+    
+    if "text_productivity" in groups:
+        scores["text_productivity_score"] = normalize_score([
+            out["token_count"], out["word_count"], out["sentence_count"], out["avg_sentence_length"]
+        ] + list(sentence_metrics.values()))
+    
+    if "orthography_formatting" in groups:
+        # For orthography - invert spelling error rate (higher errors = lower score)
+        spelling_error_rate = spelling_mistakes["spelling_error_count"] / max(1, spelling_mistakes["total_amount_of_words"])
+        scores["orthography_formatting_score"] = normalize_score([
+            out["capitalization_ratio"], out["uppercase_letter_ratio"], out["lowercase_letter_ratio"],
+            out["digits_ratio"], 1 - spelling_error_rate
+        ])
+    
+    if "punctuation_mechanics" in groups:
+        scores["punctuation_mechanics_score"] = normalize_score([
+            out["punctuation_density"], out["punctuation_diversity"]
+        ] + list(punctuation_counts.values()))
+    
+    return {"metrics": out, "scores": scores}
@@ -1,24 +1,29 @@
 # orthography and formatting metrics
 
-import re
+from .text_context import build_text_context
 
 
-def find_spelling_mistakes(text: str, wordbank=None) -> dict:
+def find_spelling_mistakes(text: str, wordbank=None, ctx=None) -> dict:
     """
     o(1) look up from globally stored set() of norwegian words.
     """
     if not text or not text.strip():
-        return {"spelling_error_count": 0, "spelling_error_list": []}
+        return {"total_amount_of_words": 0, "spelling_error_count": 0, "spelling_error_list": []}
     
     if wordbank is None:
         raise ValueError("wordbank parameter is required")
 
+    if ctx is None:
+        ctx = build_text_context(text)
+    tokenized = ctx.tokenized
+
     mistakes = []
-    word_pattern = re.compile(r'\b[a-zA-ZæøåÆØÅ]+\b')
+    total_words = 0
     
-    for match in word_pattern.finditer(text):
-        word = match.group().lower()
-        position = match.start()
+    for surface, word, position, bounded in zip(tokenized.words, tokenized.lower, tokenized.offsets, tokenized.bounded):
+        if not bounded:
+            continue
+        total_words += 1
         # skip one-letter words
         if len(word) <= 1:
             continue
@@ -31,8 +36,7 @@ def find_spelling_mistakes(text: str, wordbank=None) -> dict:
             ):
                 continue
 
-            mistakes.append({"word": match.group(), "position": position})
-    total_words = len(re.findall(r'\b[a-zA-ZæøåÆØÅ]+\b', text))
+            mistakes.append({"word": surface, "position": position})
     return {
         "total_amount_of_words" : total_words, 
         "spelling_error_count": len(mistakes),
@@ -40,12 +44,15 @@ def find_spelling_mistakes(text: str, wordbank=None) -> dict:
     }
 
 
-def calculate_capitalization_ratio(text: str) -> float:
+def calculate_capitalization_ratio(text: str, ctx=None) -> float:
     # ratio of capitalized words
     if not text or not text.strip():
         return 0.0
 
-    words = re.findall(r'\b[a-zA-ZæøåÆØÅ]+\b', text)
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.tokenized.bounded_words()
     if not words:
         return 0.0
 
@@ -3,8 +3,10 @@
 import re
 import math
 
+from .text_context import build_text_context
 
-def calculate_lix(text: str) -> float:
+
+def calculate_lix(text: str, ctx=None) -> float:
     # lix readability score
     if not text or not text.strip():
         return 0.0
@@ -14,7 +16,10 @@ def calculate_lix(text: str) -> float:
     if sentence_count == 0:
         return 0.0
 
-    words = re.findall(r'[a-zA-ZæøåÆØÅ]+', text)
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words
     word_count = len(words)
     if word_count == 0:
         return 0.0
@@ -25,19 +30,18 @@ def calculate_lix(text: str) -> float:
     return lix_score
 
 
-def calculate_sentence_length_std_dev(text: str, nlp=None) -> float:
+def calculate_sentence_length_std_dev(text: str, nlp=None, ctx=None) -> float:
     # sentence length standard deviation
     if not text or not text.strip():
         return 0.0
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
-
-    doc = nlp(text)
-    sentences = list(doc.sents)
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
 
     sentence_lengths = []
-    for sent in sentences:
+    for sent in ctx.sentences:
         sent_words = [token for token in sent if token.is_alpha]
         if sent_words:
             sentence_lengths.append(len(sent_words))
@@ -1,18 +1,19 @@
 # pos ratios and content words
 
-import re
+from .text_context import build_text_context
 
 
-def calculate_pos_ratios(text: str, nlp=None) -> dict:
+def calculate_pos_ratios(text: str, nlp=None, ctx=None) -> dict:
     # returns dict of all pos ratios
     if not text or not text.strip():
         return {}
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
 
-    doc = nlp(text)
-    tokens = [token for token in doc if token.is_alpha]
+    tokens = ctx.tokens
     total_tokens = len(tokens)
     if total_tokens == 0:
         return {}
@@ -27,16 +28,17 @@ def calculate_pos_ratios(text: str, nlp=None) -> dict:
             for pos, count in pos_counts.items()}
 
 
-def calculate_noun_ratio(text: str, nlp=None) -> float:
+def calculate_noun_ratio(text: str, nlp=None, ctx=None) -> float:
     # noun ratio
     if not text or not text.strip():
         return 0.0
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
 
-    doc = nlp(text)
-    tokens = [token for token in doc if token.is_alpha]
+    tokens = ctx.tokens
     total_tokens = len(tokens)
     if total_tokens == 0:
         return 0.0
@@ -45,16 +47,17 @@ def calculate_noun_ratio(text: str, nlp=None) -> float:
     return noun_count / total_tokens
 
 
-def calculate_adjective_ratio(text: str, nlp=None) -> float:
+def calculate_adjective_ratio(text: str, nlp=None, ctx=None) -> float:
     # adjective ratio
     if not text or not text.strip():
         return 0.0
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
 
-    doc = nlp(text)
-    tokens = [token for token in doc if token.is_alpha]
+    tokens = ctx.tokens
     total_tokens = len(tokens)
     if total_tokens == 0:
         return 0.0
@@ -63,17 +66,23 @@ def calculate_adjective_ratio(text: str, nlp=None) -> float:
     return adj_count / total_tokens
 
 
-def calculate_content_word_ratio(text: str, pos_categories=None) -> float:
+def calculate_content_word_ratio(text: str, pos_categories=None, ctx=None, lexicon_index=None) -> float:
     # content words (nouns/verbs/adj/adv) ratio
     if not text or not text.strip():
         return 0.0
     
-    if pos_categories is None:
+    if pos_categories is None and lexicon_index is None:
         raise ValueError("pos_categories parameter is required")
 
-    words = re.findall(r"[a-zA-ZæøåÆØÅ]+", text.lower())
+    if ctx is None:
+        ctx = build_text_context(text)
+
+    words = ctx.words_lower
     if not words:
         return 0.0
 
-    content_count = sum(1 for word in words if word in pos_categories["content_words"])
+    if lexicon_index is not None:
+        content_count = ctx.category_counts(lexicon_index)["content_words"]
+    else:
+        content_count = sum(1 for word in words if word in pos_categories["content_words"])
     return content_count / len(words)
\ No newline at end of file
@@ -0,0 +1,35 @@
+# shared per-text analysis context
+
+from .tokenizer import tokenize
+
+
+class TextContext:
+    """
+    Everything the metric modules need from one text, computed once:
+    the spaCy doc, alpha tokens, sentence spans and the tokenized words
+    (surface forms, offsets, lowercase forms and word counts).
+    """
+
+    def __init__(self, text: str, doc=None):
+        self.text = text
+        self.doc = doc
+        self.tokens = [token for token in doc if token.is_alpha] if doc is not None else []
+        # profiles without a sentence component leave boundaries unset
+        self.sentences = list(doc.sents) if doc is not None and doc.has_annotation("SENT_START") else []
+        self.tokenized = tokenize(text)
+        self.words = self.tokenized.words
+        self.words_lower = self.tokenized.lower
+        self.word_counts = self.tokenized.counts
+        self._category_counts = None
+
+    def category_counts(self, lexicon_index) -> dict:
+        # fused lexicon category counts, computed on first use
+        if self._category_counts is None:
+            self._category_counts = lexicon_index.count_categories(self.word_counts)
+        return self._category_counts
+
+
+def build_text_context(text: str, nlp=None, disable=()) -> TextContext:
+    # parse once (if there is anything to parse) and wrap in a context
+    doc = nlp(text, disable=list(disable)) if nlp is not None and text and text.strip() else None
+    return TextContext(text, doc)
@@ -2,8 +2,10 @@
 
 import re
 
+from .text_context import build_text_context
 
-def calculate_sentence_metrics(text: str, nlp=None) -> dict:
+
+def calculate_sentence_metrics(text: str, nlp=None, ctx=None) -> dict:
     # sentence metrics
     if not text or not text.strip():
         return {
@@ -12,16 +14,14 @@ def calculate_sentence_metrics(text: str, nlp=None) -> dict:
             "avg_word_length": 0.0
         }
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
-
-    doc = nlp(text)
-    sentences = list(doc.sents)
-
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
     sentence_lengths = []
     words = []
 
-    for sent in sentences:
+    for sent in ctx.sentences:
         sent_words = [token for token in sent if token.is_alpha]
         if sent_words:
             sentence_lengths.append(len(sent_words))
@@ -45,55 +45,53 @@ def calculate_sentence_metrics(text: str, nlp=None) -> dict:
     }
 
 
-def calculate_token_count(text: str, nlp=None) -> int:
+def calculate_token_count(text: str, nlp=None, ctx=None) -> int:
     # token count
     if not text or not text.strip():
         return 0
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
-
-    doc = nlp(text)
-    return len(doc)
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
+    return len(ctx.doc)
 
 
-def calculate_word_count(text: str, nlp=None) -> int:
+def calculate_word_count(text: str, nlp=None, ctx=None) -> int:
     # word count
     if not text or not text.strip():
         return 0
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
+    return len(ctx.tokens)
 
-    doc = nlp(text)
-    return len([token for token in doc if token.is_alpha])
 
-
-def calculate_sentence_count(text: str, nlp=None) -> int:
+def calculate_sentence_count(text: str, nlp=None, ctx=None) -> int:
     # sentence count
     if not text or not text.strip():
         return 0
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
-
-    doc = nlp(text)
-    return len(list(doc.sents))
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
+    return len(ctx.sentences)
 
 
-def calculate_avg_sentence_length(text: str, nlp=None) -> float:
+def calculate_avg_sentence_length(text: str, nlp=None, ctx=None) -> float:
     # avg sentence length
     if not text or not text.strip():
         return 0.0
     
-    if nlp is None:
-        raise ValueError("nlp parameter is required")
-
-    doc = nlp(text)
-    sentences = list(doc.sents)
-    
+    if ctx is None:
+        if nlp is None:
+            raise ValueError("nlp parameter is required")
+        ctx = build_text_context(text, nlp)
     sentence_lengths = []
-    for sent in sentences:
+    for sent in ctx.sentences:
         sent_words = [token for token in sent if token.is_alpha]
         if sent_words:
             sentence_lengths.append(len(sent_words))
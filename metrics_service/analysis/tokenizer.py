@@ -0,0 +1,52 @@
+# single regex tokenization pass shared by all word-based metrics
+
+import re
+from collections import Counter
+from typing import List
+
+
+WORD_PATTERN = re.compile(r"[a-zA-ZæøåÆØÅ]+")
+
+
+def _is_word_char(c: str) -> bool:
+    # same definition of a word character as \b in re
+    return c.isalnum() or c == "_"
+
+
+class TokenizedText:
+    """
+    Words of a text from one scan of WORD_PATTERN:
+      - words:   surface forms, original case
+      - offsets: start position of each word in the text
+      - lower:   lowercase forms
+      - bounded: True where the word also matches \\b[...]+\\b, i.e. it is
+                 not glued to digits, '_' or other letters (é, ü, ...)
+      - counts:  Counter over the lowercase forms
+    """
+
+    def __init__(self, text: str):
+        self.words: List[str] = []
+        self.offsets: List[int] = []
+        self.bounded: List[bool] = []
+
+        if text:
+            text_len = len(text)
+            for match in WORD_PATTERN.finditer(text):
+                start, end = match.span()
+                self.words.append(match.group())
+                self.offsets.append(start)
+                self.bounded.append(
+                    (start == 0 or not _is_word_char(text[start - 1]))
+                    and (end == text_len or not _is_word_char(text[end]))
+                )
+
+        self.lower: List[str] = [w.lower() for w in self.words]
+        self.counts = Counter(self.lower)
+
+    def bounded_words(self) -> List[str]:
+        # original-case words matching \b[...]+\b
+        return [w for w, b in zip(self.words, self.bounded) if b]
+
+
+def tokenize(text: str) -> TokenizedText:
+    return TokenizedText(text)
@@ -1,25 +1,133 @@
 # app.py (strict payload acceptance + optional mock)
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from schemas import SubmissionIn, SubmissionOut, MetricsResultOut, StudentOut, TextOut
-from resources import init_resources
-from analysis.orchestrate_text_metrics import return_text_metrics
+from fastapi.responses import StreamingResponse, JSONResponse
+from schemas import SubmissionIn, SubmissionOut, MetricsResultOut, StudentOut, TextOut, MetricsJobIn, JobStatusOut
+from resources import load_resources, configure_logging, log_event, SPACY_BATCH_SIZE, SPACY_PIPELINE_PROFILE
+from analysis.orchestrate_text_metrics import iter_text_metrics, METRICS_VERSION
+from analysis.metric_groups import resolve_profile, expand_metrics
+from worker_pool import METRICS_WORKERS, start_worker_pool, compute_texts_in_pool, iter_texts_in_pool
+from result_cache import ResultCache, cache_version_key
+from job_queue import JobQueue, JobQueueFull, InvalidCallbackUrl, check_callback_url, DONE, FAILED
+import os
 import json
 import time
+import asyncio
+import logging
 from starlette.concurrency import run_in_threadpool
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger("metrics_service.app")
 
-# Initialize resources once at startup
-nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, meta = init_resources()
+# spaCy batch size for /compute-stream; small so the first line is sent after about one text
+STREAM_BATCH_SIZE = int(os.getenv("METRICS_STREAM_BATCH_SIZE", "1"))
 
-def process_metrics_request(submission: SubmissionIn, resources=None) -> SubmissionOut:
+# spaCy pipeline profile for the metric suite (fails fast on a bad SPACY_PIPELINE_PROFILE)
+METRICS_PROFILE = resolve_profile(SPACY_PIPELINE_PROFILE)
+
+# Process pool for /compute, only started when METRICS_WORKERS > 1
+worker_pool = None
+
+# Loaded in the background after startup; requests get 503 until /ready says so
+resources = None
+resource_timings = {}
+startup_error = None
+
+# Content-addressed cache of per-text results, keyed on text + model/lexicon/metric versions
+result_cache = None
+
+
+async def load_service_state() -> None:
+    """
+    Load resources (and start the worker pool) while the server already
+    answers /health, then open the result cache and resume queued jobs.
+    """
+    global resources, resource_timings, result_cache, worker_pool, startup_error
+    try:
+        t0 = time.perf_counter()
+        loads = [run_in_threadpool(load_resources)]
+        if METRICS_WORKERS > 1:
+            loads.append(run_in_threadpool(start_worker_pool, METRICS_WORKERS))
+        loaded, *pool = await asyncio.gather(*loads)
+        loaded_resources, resource_timings = loaded
+        worker_pool = pool[0] if pool else None
+
+        result_cache = ResultCache(cache_version_key(loaded_resources[-1], METRICS_VERSION, METRICS_PROFILE))
+        resources = loaded_resources
+        log_event("service_ready", seconds=round(time.perf_counter() - t0, 4), workers=METRICS_WORKERS)
+
+        resumed = job_queue.resume()
+        if resumed:
+            log_event("jobs_resumed", jobs=resumed)
+    except Exception as e:
+        startup_error = str(e)
+        logger.exception("Failed to load resources")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global worker_pool
+    startup = asyncio.create_task(load_service_state())
+    yield
+    if not startup.done():
+        startup.cancel()
+    job_queue.close()
+    if worker_pool is not None:
+        worker_pool.shutdown()
+        worker_pool = None
+    if result_cache is not None:
+        result_cache.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def ensure_ready() -> None:
+    # scoring endpoints are unavailable until the background load has finished
+    if resources is None:
+        detail = f"Resources failed to load: {startup_error}" if startup_error else "Resources are still loading"
+        raise HTTPException(status_code=503, detail=detail)
+
+def submission_texts(submission: SubmissionIn) -> list:
+    # every text in the submission, in student/text order
+    return [text.text for student in submission.students for text in student.texts]
+
+
+def select_metrics(submission: SubmissionIn):
     """
     Input: submission (SubmissionIn)
+    Output: (metrics, profile, cache variant)
+    metrics is None for the full suite; the profile is the smallest spaCy
+    pipeline for the selection (None: no parse needed)
+    """
+    if submission.metrics is None:
+        return None, METRICS_PROFILE, ""
+    try:
+        metrics = expand_metrics(submission.metrics)
+        profile = resolve_profile(SPACY_PIPELINE_PROFILE, metrics)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    variant = json.dumps({"metrics": sorted(metrics), "profile": profile})
+    return metrics, profile, variant
+
+def process_metrics_request(submission: SubmissionIn, resources=None, batch_size: int = SPACY_BATCH_SIZE, precomputed=None,
+                            metrics=None, profile=METRICS_PROFILE) -> SubmissionOut:
+    """
+    Input: submission (SubmissionIn), resources (tuple), batch_size (int),
+           precomputed (optional list of per-text metrics in submission order),
+           metrics (optional set of metric names), profile (pipeline profile)
     Output: SubmissionOut
     """
     
     submission_dict = submission.dict()
+    
+    if precomputed is not None:
+        metrics_iter = iter(precomputed)
+    else:
+        # gather every text in the submission so spaCy can parse them in batches
+        metrics_iter = iter_text_metrics(submission_texts(submission), resources, batch_size=batch_size, profile=profile, metrics=metrics)
+    
     students_out = []
     
     for student in submission_dict["students"]:
@@ -30,8 +138,8 @@ def process_metrics_request(submission: SubmissionIn, resources=None) -> Submiss
             text_id = text_obj["text_id"]
             text_content = text_obj["text"]
             
-            # get all metrics for this text using the orchestrate function
-            text_metrics = return_text_metrics(text_content, resources)
+            # metrics for this text, from the batched pipeline
+            text_metrics = next(metrics_iter)
             
             text_out = {
                 "text_id": text_id,
@@ -57,6 +165,116 @@ def process_metrics_request(submission: SubmissionIn, resources=None) -> Submiss
         result=result
     )
 
+async def run_metrics_request(submission: SubmissionIn) -> SubmissionOut:
+    """
+    Input: submission (SubmissionIn)
+    Output: SubmissionOut
+    Serves cached texts from the result cache and computes the rest, using
+    the process pool when it is running, otherwise the thread pool. Cache
+    lookups and writes (SQLite with METRICS_CACHE_DB_PATH) stay off the event loop.
+    """
+    metrics, profile, variant = select_metrics(submission)
+    texts = submission_texts(submission)
+    results, missing = await run_in_threadpool(result_cache.split, texts, variant)
+    
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        if worker_pool is not None:
+            computed = await compute_texts_in_pool(worker_pool, missing_texts, profile=profile, metrics=metrics)
+        else:
+            computed = await run_in_threadpool(
+                lambda: list(iter_text_metrics(missing_texts, resources, batch_size=SPACY_BATCH_SIZE, profile=profile, metrics=metrics))
+            )
+        await run_in_threadpool(result_cache.fill, texts, results, missing, computed, variant)
+    
+    return process_metrics_request(submission, precomputed=results)
+
+def iter_metrics_lines(submission: SubmissionIn, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Input: submission (SubmissionIn), batch_size (int)
+    Output: generator of NDJSON lines
+    One line per text as soon as it is scored, then a summary line. Cached
+    texts are answered right away; misses go to the process pool when it is
+    running (chunks of batch_size texts, a bounded window in flight),
+    otherwise through one lazy batched pipeline in this process, so no
+    result is held long after its line is sent.
+    """
+    start_time = time.perf_counter()
+    metrics, profile, variant = select_metrics(submission)
+    texts = submission_texts(submission)
+    cached, missing = result_cache.split(texts, variant)
+    missing_texts = [texts[i] for i in missing]
+    if worker_pool is not None:
+        computed = iter_texts_in_pool(worker_pool, missing_texts, batch_size=batch_size, profile=profile, metrics=metrics, chunk_size=batch_size)
+    else:
+        computed = iter_text_metrics(missing_texts, resources, batch_size=batch_size, profile=profile, metrics=metrics)
+    
+    num_texts = 0
+    try:
+        for student in submission.students:
+            for text_obj in student.texts:
+                text_metrics = cached[num_texts]
+                if text_metrics is None:
+                    text_metrics = next(computed)
+                    result_cache.put(text_obj.text, text_metrics, variant)
+                # drop the reference once the line is built
+                cached[num_texts] = None
+                num_texts += 1
+                yield json.dumps({
+                    "type": "text",
+                    "student_id": student.student_id,
+                    "text_id": text_obj.text_id,
+                    "metrics": text_metrics["metrics"],
+                    "scores": text_metrics["scores"]
+                }) + "\n"
+    except Exception as e:
+        # the status line is already sent, so report the failure in-band
+        print(f"Error processing stream: {str(e)}")
+        yield json.dumps({"type": "error", "detail": "Internal server error", "texts": num_texts}) + "\n"
+        return
+    
+    elapsed_time = time.perf_counter() - start_time
+    print(f"Streamed {len(submission.students)} students with {num_texts} texts in {elapsed_time:.4f} seconds")
+    yield json.dumps({
+        "type": "summary",
+        "status": "ok",
+        "students": len(submission.students),
+        "texts": num_texts,
+        "cached": num_texts - len(missing),
+        "elapsed_time_sec": elapsed_time
+    }) + "\n"
+
+def run_metrics_job(payload: dict, progress) -> dict:
+    """
+    Input: payload (SubmissionIn as dict), progress (callable taking the number of finished texts)
+    Output: SubmissionOut as dict
+    Job handler, runs on a job worker thread. Same cache and pool as /compute.
+    """
+    submission = SubmissionIn(**payload)
+    metrics, profile, variant = select_metrics(submission)
+    texts = submission_texts(submission)
+    results, missing = result_cache.split(texts, variant)
+    done = len(texts) - len(missing)
+    progress(done)
+    
+    missing_texts = [texts[i] for i in missing]
+    if worker_pool is not None:
+        computed_iter = iter_texts_in_pool(worker_pool, missing_texts, profile=profile, metrics=metrics)
+    else:
+        computed_iter = iter_text_metrics(missing_texts, resources, batch_size=SPACY_BATCH_SIZE, profile=profile, metrics=metrics)
+    
+    computed = []
+    for text_metrics in computed_iter:
+        computed.append(text_metrics)
+        done += 1
+        progress(done)
+    result_cache.fill(texts, results, missing, computed, variant)
+    
+    return process_metrics_request(submission, precomputed=results).dict()
+
+# Local job queue for batches that outlive a gateway timeout
+job_queue = JobQueue(run_metrics_job)
+
 # main endpoint: accepts JSON payload
 @app.post("/compute", response_model=SubmissionOut)
 async def compute(submission: SubmissionIn):
@@ -64,10 +282,12 @@ async def compute(submission: SubmissionIn):
     Input: submission (SubmissionIn)
     Output: SubmissionOut
     """
+    ensure_ready()
+    select_metrics(submission)  # 400 on unknown metric names
     start_time = time.perf_counter()
     
     try:
-        result = await run_in_threadpool(process_metrics_request, submission, (nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, meta))
+        result = await run_metrics_request(submission)
         elapsed_time = time.perf_counter() - start_time
         print(f"Processed {len(submission.students)} students with {sum(len(s.texts) for s in submission.students)} texts in {elapsed_time:.4f} seconds")
         return result
@@ -75,6 +295,18 @@ async def compute(submission: SubmissionIn):
         print(f"Error processing request: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# streaming variant: one NDJSON line per text, then a summary line
+@app.post("/compute-stream")
+async def compute_stream(submission: SubmissionIn):
+    """
+    Input: submission (SubmissionIn)
+    Output: StreamingResponse (application/x-ndjson)
+    """
+    ensure_ready()
+    select_metrics(submission)  # 400 before the stream starts
+    # sync generator: Starlette runs it in the thread pool, off the event loop
+    return StreamingResponse(iter_metrics_lines(submission), media_type="application/x-ndjson")
+
 # optional: mock endpoint (reads from local file)
 @app.post("/compute-mock", response_model=SubmissionOut)
 async def compute_mock():
@@ -82,6 +314,7 @@ async def compute_mock():
     Input: None
     Output: SubmissionOut
     """
+    ensure_ready()
     try:
         with open("data/mock_data.json", "r", encoding="utf-8") as f:
             payload = json.load(f)
@@ -92,24 +325,106 @@ async def compute_mock():
     
     try:
         submission = SubmissionIn(**payload)
-        result = await run_in_threadpool(process_metrics_request, submission, (nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, meta))
+        result = await run_metrics_request(submission)
         print(f"Processed mock data with {len(submission.students)} students")
         return result
     except Exception as e:
         print(f"Error processing mock request: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing mock data")
 
+@app.post("/jobs", response_model=JobStatusOut, status_code=202)
+async def submit_job(job: MetricsJobIn):
+    """
+    Input: job (MetricsJobIn)
+    Output: JobStatusOut
+    """
+    ensure_ready()
+    if job.callback_url:
+        try:
+            await run_in_threadpool(check_callback_url, job.callback_url)
+        except InvalidCallbackUrl as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    submission = SubmissionIn(students=job.students, metrics=job.metrics)
+    select_metrics(submission)
+    try:
+        status = job_queue.submit(submission.dict(), len(submission_texts(submission)), job.callback_url)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Job queue is full ({str(e)})")
+    print(f"Queued job {status['job_id']} with {status['total']} texts")
+    return status
+
+@app.get("/jobs/{job_id}", response_model=JobStatusOut)
+async def get_job(job_id: str):
+    """
+    Input: job_id (str)
+    Output: JobStatusOut
+    """
+    status = job_queue.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/jobs/{job_id}/result", response_model=SubmissionOut)
+async def get_job_result(job_id: str):
+    """
+    Input: job_id (str)
+    Output: SubmissionOut
+    """
+    status = job_queue.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {status['error']}")
+    if status["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    return job_queue.result(job_id)
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """
+    Input: None
+    Output: dict
+    """
+    ensure_ready()
+    return result_cache.stats()
+
 @app.get("/health")
 async def health_check():
     """
     Input: None
     Output: dict
+    Liveness: the process is up, resources may still be loading
     """
     return {
         "status": "healthy",
         "service": "metrics_service"
     }
 
+@app.get("/ready")
+async def ready_check():
+    """
+    Input: None
+    Output: dict (503 until resources are loaded)
+    Readiness: resources are loaded and requests can be scored
+    """
+    if resources is None:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "failed" if startup_error else "loading",
+                "service": "metrics_service",
+                "error": startup_error
+            }
+        )
+    return {
+        "status": "ready",
+        "service": "metrics_service",
+        "workers": METRICS_WORKERS,
+        "pipeline_profile": METRICS_PROFILE,
+        "resources": resource_timings
+    }
+
 @app.get("/")
 async def root():
     """
@@ -121,8 +436,14 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /compute": "Compute text metrics",
+            "POST /compute-stream": "Compute text metrics, streamed as NDJSON",
             "POST /compute-mock": "Compute using mock data", 
-            "GET /health": "Health check",
+            "POST /jobs": "Queue a batch as a background job",
+            "GET /jobs/{job_id}": "Job status and progress",
+            "GET /jobs/{job_id}/result": "Result of a finished job",
+            "GET /cache-stats": "Result cache hit/miss counters",
+            "GET /health": "Liveness check",
+            "GET /ready": "Readiness check with per-resource load timings",
             "GET /": "Service info"
         }
     }
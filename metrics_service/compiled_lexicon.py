@@ -0,0 +1,251 @@
+# File: text-analysis/compiled_lexicon.py
+# Part of: text-analysis project
+
+import os
+import sys
+import mmap
+import zlib
+import struct
+from array import array
+from typing import Dict, Iterable, Iterator, Optional
+
+
+# flags per word form
+IN_WORDBANK = 1
+HAS_LEMMA = 2
+CONTENT_WORD = 4
+FUNCTION_WORD = 8
+
+_MAGIC = b"LXB1"
+# magic, entries, hash slots, lemmas, wordbank/content/function word counts, lemma mapping count
+_HEADER = struct.Struct("<4sIIIIIII")
+_NO_LEMMA = 0xFFFFFFFF
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _table_size(entries: int) -> int:
+    # power of two, at most half full, so probe sequences stay short
+    size = 8
+    while size < entries * 2:
+        size *= 2
+    return size
+
+
+def write_compiled_lexicon(path: str, wordbank: Iterable[str], form_to_lemma: Dict[str, str],
+                           content_words: Iterable[str], function_words: Iterable[str]) -> dict:
+    """
+    Compile the lexicons into one read-only file, laid out as flat arrays:
+      header | hash slots (u32) | form offsets (u32) | flags (u8) | lemma ids (u32)
+             | lemma offsets (u32) | form bytes | lemma bytes
+    Forms are looked up through an open-addressing table keyed by crc32 of the
+    UTF-8 form. Lemmas are deduplicated into their own string pool.
+    Returns the section counts.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("compiled lexicon files are written little-endian")
+
+    wordbank = set(wordbank)
+    content_words = set(content_words)
+    function_words = set(function_words)
+    forms = sorted(wordbank | set(form_to_lemma) | content_words | function_words)
+    lemmas = sorted(set(form_to_lemma.values()))
+    lemma_ids = {lemma: i for i, lemma in enumerate(lemmas)}
+
+    form_bytes = [form.encode("utf-8") for form in forms]
+    form_offsets = array("I", [0])
+    flags = array("B")
+    form_lemmas = array("I")
+    for form, encoded in zip(forms, form_bytes):
+        form_offsets.append(form_offsets[-1] + len(encoded))
+        flag = 0
+        if form in wordbank:
+            flag |= IN_WORDBANK
+        if form in content_words:
+            flag |= CONTENT_WORD
+        if form in function_words:
+            flag |= FUNCTION_WORD
+        lemma = form_to_lemma.get(form)
+        if lemma is not None:
+            flag |= HAS_LEMMA
+        flags.append(flag)
+        form_lemmas.append(lemma_ids[lemma] if lemma is not None else _NO_LEMMA)
+
+    lemma_bytes = [lemma.encode("utf-8") for lemma in lemmas]
+    lemma_offsets = array("I", [0])
+    for encoded in lemma_bytes:
+        lemma_offsets.append(lemma_offsets[-1] + len(encoded))
+
+    table_size = _table_size(len(forms))
+    mask = table_size - 1
+    slots = array("I", bytes(4 * table_size))
+    for i, encoded in enumerate(form_bytes):
+        slot = zlib.crc32(encoded) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = i + 1  # 0 marks an empty slot
+
+    counts = {
+        "forms": len(forms),
+        "lemmas": len(lemmas),
+        "wordbank": len(wordbank),
+        "content_words": len(content_words),
+        "function_words": len(function_words),
+        "form_to_lemma": len(form_to_lemma),
+    }
+    header = _HEADER.pack(
+        _MAGIC, len(forms), table_size, len(lemmas),
+        len(wordbank), len(content_words), len(function_words), len(form_to_lemma),
+    )
+
+    # write next to the target and swap in, so readers never map a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for section in (header, slots.tobytes(), form_offsets.tobytes(), flags.tobytes(),
+                        form_lemmas.tobytes(), lemma_offsets.tobytes(), b"".join(form_bytes)):
+            f.write(section)
+            f.write(bytes(_align(f.tell()) - f.tell()))
+        f.write(b"".join(lemma_bytes))
+    os.replace(tmp_path, path)
+    return counts
+
+
+class CompiledLexicon:
+    """
+    Memory-mapped view of a file written by write_compiled_lexicon.
+    The mapping is read-only and backed by the page cache, so every worker
+    process that opens the same file shares one copy of the lexicon.
+    Lookups are O(len(word)): one crc32 plus a short probe sequence.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, forms, table_size, lemmas, self.wordbank_count, self.content_count, self.function_count, self.lemma_count = (
+            _HEADER.unpack_from(view, 0)
+        )
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a compiled lexicon file")
+        if sys.byteorder != "little":
+            raise ValueError("compiled lexicon files can only be read on little-endian machines")
+
+        self.forms = forms
+        self.lemmas = lemmas
+        self._mask = table_size - 1
+
+        offset = _HEADER.size
+
+        def section(length: int, fmt: str):
+            nonlocal offset
+            offset = _align(offset)
+            size = length * struct.calcsize(fmt)
+            data = view[offset:offset + size].cast(fmt)
+            offset += size
+            return data
+
+        self._slots = section(table_size, "I")
+        self._form_offsets = section(forms + 1, "I")
+        self._flags = section(forms, "B")
+        self._form_lemmas = section(forms, "I")
+        self._lemma_offsets = section(lemmas + 1, "I")
+        self._form_pool = section(self._form_offsets[forms], "B")
+        self._lemma_pool = section(self._lemma_offsets[lemmas], "B")
+
+        self.wordbank = LexiconSet(self, IN_WORDBANK, self.wordbank_count)
+        self.content_words = LexiconSet(self, CONTENT_WORD, self.content_count)
+        self.function_words = LexiconSet(self, FUNCTION_WORD, self.function_count)
+        self.form_to_lemma = LemmaMap(self)
+
+    def find(self, word: str) -> int:
+        # index of the form, or -1
+        key = word.encode("utf-8")
+        offsets = self._form_offsets
+        slots = self._slots
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            index = slots[slot] - 1
+            if index < 0:
+                return -1
+            if self._form_pool[offsets[index]:offsets[index + 1]] == key:
+                return index
+            slot = (slot + 1) & self._mask
+
+    def flags(self, word: str) -> int:
+        index = self.find(word)
+        return self._flags[index] if index >= 0 else 0
+
+    def form(self, index: int) -> str:
+        return bytes(self._form_pool[self._form_offsets[index]:self._form_offsets[index + 1]]).decode("utf-8")
+
+    def lemma(self, index: int) -> Optional[str]:
+        lemma_id = self._form_lemmas[index]
+        if lemma_id == _NO_LEMMA:
+            return None
+        return bytes(self._lemma_pool[self._lemma_offsets[lemma_id]:self._lemma_offsets[lemma_id + 1]]).decode("utf-8")
+
+    def iter_forms(self, flag: int) -> Iterator[str]:
+        for index in range(self.forms):
+            if self._flags[index] & flag:
+                yield self.form(index)
+
+
+class LexiconSet:
+    """
+    Read-only set view (membership, len, iteration) over the forms with one flag.
+    """
+
+    def __init__(self, lexicon: CompiledLexicon, flag: int, count: int):
+        self._lexicon = lexicon
+        self._flag = flag
+        self._count = count
+
+    def __contains__(self, word) -> bool:
+        return bool(self._lexicon.flags(word) & self._flag) if isinstance(word, str) else False
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        return self._lexicon.iter_forms(self._flag)
+
+
+class LemmaMap:
+    """
+    Read-only dict view of form -> lemma.
+    """
+
+    def __init__(self, lexicon: CompiledLexicon):
+        self._lexicon = lexicon
+
+    def get(self, word, default=None):
+        if not isinstance(word, str):
+            return default
+        index = self._lexicon.find(word)
+        if index < 0:
+            return default
+        lemma = self._lexicon.lemma(index)
+        return default if lemma is None else lemma
+
+    def __getitem__(self, word) -> str:
+        lemma = self.get(word)
+        if lemma is None:
+            raise KeyError(word)
+        return lemma
+
+    def __contains__(self, word) -> bool:
+        return self.get(word) is not None
+
+    def __len__(self) -> int:
+        return self._lexicon.lemma_count
+
+    def __iter__(self) -> Iterator[str]:
+        return self._lexicon.iter_forms(HAS_LEMMA)
+
+
+def load_compiled_lexicon(path: str) -> CompiledLexicon:
+    return CompiledLexicon(path)
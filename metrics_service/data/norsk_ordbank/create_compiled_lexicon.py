@@ -0,0 +1,40 @@
+"""
+Compile wordbank.pkl, lemma_data.pkl and pos_categories.pkl into lexicon.lxb,
+a single memory-mapped file that init_resources() loads instead of the
+pickles when it is present. Run from metrics_service, after the pickles exist:
+
+    python -m data.norsk_ordbank.create_compiled_lexicon
+"""
+
+import os
+import pickle
+import time
+
+from compiled_lexicon import write_compiled_lexicon
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def load(name):
+        with open(os.path.join(current_dir, name), "rb") as f:
+            return pickle.load(f)
+
+    wordbank = load("wordbank.pkl")
+    _, form_to_lemma = load("lemma_data.pkl")
+    pos_categories = load("pos_categories.pkl")
+
+    output_path = os.path.join(current_dir, "lexicon.lxb")
+    t0 = time.perf_counter()
+    counts = write_compiled_lexicon(
+        output_path,
+        wordbank,
+        form_to_lemma,
+        pos_categories["content_words"],
+        pos_categories.get("function_words", set()),
+    )
+    print(f"Saved lexicon.lxb ({counts}) in {time.perf_counter() - t0:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
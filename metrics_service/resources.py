@@ -2,11 +2,18 @@
 # Part of: text-analysis project
 
 import os
+import json
 import time
 import pickle
+import hashlib
+import logging
 import spacy
+from concurrent.futures import ThreadPoolExecutor
 from spacy.language import Language
-from typing import Any, Tuple
+from typing import Any, Dict, Tuple
+
+from analysis.lexicon_index import LexiconIndex, build_lexicon_index
+from compiled_lexicon import load_compiled_lexicon
 
 
 WORDBANK_PKL = "data/norsk_ordbank/wordbank.pkl"
@@ -14,29 +21,40 @@ LEMMA_PKL    = "data/norsk_ordbank/lemma_data.pkl"
 PRONOUNS_PKL = "data/norsk_ordbank/pronouns.pkl"
 CONNECTIVES_PKL = "data/norsk_ordbank/connectives.pkl"
 POS_CATEGORIES_PKL = "data/norsk_ordbank/pos_categories.pkl"
+# compiled wordbank + lemma + content/function word file (create_compiled_lexicon.py);
+# used instead of those three pickles when present. Empty disables it.
+COMPILED_LEXICON = os.getenv("METRICS_COMPILED_LEXICON", "data/norsk_ordbank/lexicon.lxb")
 SPACY_MODEL  = "nb_core_news_md"
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "32"))
+# components never used by a metric (no entity or lemma output is read)
+SPACY_EXCLUDE = [name for name in os.getenv("SPACY_EXCLUDE", "ner,lemmatizer").split(",") if name]
+# "auto" runs the smallest profile the metrics need (see analysis/metric_groups.py),
+# or force one of: tokens, senter, tagger, full (parser sentence boundaries)
+SPACY_PIPELINE_PROFILE = os.getenv("SPACY_PIPELINE_PROFILE", "auto")
+# threads used to load the spaCy model and the lexicons concurrently
+RESOURCE_LOAD_THREADS = int(os.getenv("RESOURCE_LOAD_THREADS", "4"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+logger = logging.getLogger("metrics_service.resources")
 
 
 def load_spacy_model() -> Language:
     """
     Load the configured spaCy model, or raise with clear instructions.
+    Components no metric uses (SPACY_EXCLUDE) are not loaded at all; which
+    of the rest run is chosen per call from the pipeline profile.
     """
-    t0 = time.perf_counter()
     try:
-        nlp = spacy.load(SPACY_MODEL)
+        nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
     except OSError as e:
         raise OSError(
             f"Failed to load spaCy model '{SPACY_MODEL}'. "
             f"spaCy version: {spacy.__version__}. "
             f"Install with: python -m spacy download {SPACY_MODEL}"
         ) from e
-    t1 = time.perf_counter()
-    meta = getattr(nlp, "meta", {})
-    print(
-        f"Loaded spaCy model '{SPACY_MODEL}' "
-        f"(spaCy {spacy.__version__}, model {meta.get('version','?')}) "
-        f"in {t1 - t0:.4f} seconds"
-    )
+    # senter ships disabled; the trimmed profiles take sentence boundaries from it instead of the parser
+    if "senter" in nlp.disabled:
+        nlp.enable_pipe("senter")
     return nlp
 
 
@@ -50,62 +68,146 @@ def load_pickle(path: str) -> Any:
         return pickle.load(f)
 
 
-def init_resources() -> Tuple[Language, Any, dict, dict, dict, dict, dict, dict]:
+def lexicon_fingerprint(paths) -> str:
+    """
+    Short version tag for the lexicon files (name, size, mtime), so cached
+    results are invalidated when the pickles are regenerated.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        st = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def log_event(event: str, **fields) -> None:
+    # one JSON object per line, easy to grep and to ship to a log pipeline
+    logger.info(json.dumps({"event": event, **fields}))
+
+
+def configure_logging() -> None:
+    # handler on the service logger only, so library INFO logs stay quiet
+    service_logger = logging.getLogger("metrics_service")
+    if not service_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        service_logger.addHandler(handler)
+        service_logger.setLevel(LOG_LEVEL)
+        service_logger.propagate = False
+
+
+def load_lemma_data(path: str) -> tuple:
+    lemma_tuple = load_pickle(path)
+    if not (isinstance(lemma_tuple, tuple) and len(lemma_tuple) == 2):
+        raise ValueError("lemma_data.pkl must be a (lemma_forms, form_to_lemma) tuple")
+    return lemma_tuple
+
+
+def load_resources() -> Tuple[tuple, Dict[str, dict]]:
     """
-    Initialize all heavy resources:
+    Initialize all heavy resources, loading independent ones concurrently:
       - spaCy model
-      - wordbank.pkl
-      - lemma_data.pkl
+      - lexicon.lxb (compiled, memory-mapped) when present, otherwise
+        wordbank.pkl, lemma_data.pkl and pos_categories.pkl
       - pronouns.pkl
       - connectives.pkl
-      - pos_categories.pkl
+    then builds the lexicon index (word -> category bitmask over pronouns,
+    connectives, pos categories).
 
     Returns:
-        (nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, meta)
-    Where `meta` contains info like:
-        {"spacy_version": "3.x.x", "model_name": "nb_core_news_md", "model_version": "..."}
+        (resources, timings) where resources is
+        (nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, lexicon_index, meta)
+        and timings maps each resource to {"seconds": ..., "entries": ...}.
+    With the compiled lexicon, wordbank / form_to_lemma / pos_categories are
+    read-only set and dict views over the mapping, and lemma_forms is None.
+    `meta` contains info like:
+        {"spacy_version": "3.x.x", "model_name": "nb_core_news_md", "model_version": "...",
+         "lexicon_version": "<fingerprint of the lexicon files>"}
+    Each timing is also logged as a "resource_loaded" event.
     """
-    nlp = load_spacy_model()
+    t_start = time.perf_counter()
+    timings: Dict[str, dict] = {}
+
+    def timed(name: str, loader, *args):
+        t0 = time.perf_counter()
+        value = loader(*args)
+        timings[name] = {"seconds": round(time.perf_counter() - t0, 4)}
+        return value
+
+    use_compiled = bool(COMPILED_LEXICON) and os.path.isfile(COMPILED_LEXICON)
+
+    with ThreadPoolExecutor(max_workers=RESOURCE_LOAD_THREADS, thread_name_prefix="load") as executor:
+        nlp_future = executor.submit(timed, "spacy_model", load_spacy_model)
+        if use_compiled:
+            lexicon_future = executor.submit(timed, "compiled_lexicon", load_compiled_lexicon, COMPILED_LEXICON)
+        else:
+            wordbank_future = executor.submit(timed, "wordbank", load_pickle, WORDBANK_PKL)
+            lemma_future = executor.submit(timed, "lemma_data", load_lemma_data, LEMMA_PKL)
+            pos_future = executor.submit(timed, "pos_categories", load_pickle, POS_CATEGORIES_PKL)
+        pronouns_future = executor.submit(timed, "pronouns", load_pickle, PRONOUNS_PKL)
+        connectives_future = executor.submit(timed, "connectives", load_pickle, CONNECTIVES_PKL)
+
+        if use_compiled:
+            # lemma_forms is not used by any metric
+            lexicon = lexicon_future.result()
+            wordbank = lexicon.wordbank
+            lemma_forms = None
+            form_to_lemma = lexicon.form_to_lemma
+            pos_categories = {"content_words": lexicon.content_words, "function_words": lexicon.function_words}
+            lexicon_paths = [COMPILED_LEXICON]
+            timings["compiled_lexicon"].update(
+                path=COMPILED_LEXICON, wordbank=len(wordbank), forms=len(form_to_lemma),
+                content_words=len(pos_categories["content_words"]),
+            )
+        else:
+            wordbank = wordbank_future.result()
+            lemma_forms, form_to_lemma = lemma_future.result()
+            pos_categories = pos_future.result()
+            lexicon_paths = [WORDBANK_PKL, LEMMA_PKL, POS_CATEGORIES_PKL]
+            timings["wordbank"]["entries"] = len(wordbank)
+            timings["lemma_data"].update(lemmas=len(lemma_forms), forms=len(form_to_lemma))
+            timings["pos_categories"]["content_words"] = len(pos_categories["content_words"])
+
+        pronouns = pronouns_future.result()
+        connectives = connectives_future.result()
+        nlp = nlp_future.result()
+
+    timings["pronouns"]["entries"] = len(pronouns["all_pronouns"])
+    timings["connectives"]["entries"] = len(connectives["all_connectives"])
+
     meta = {
         "spacy_version": spacy.__version__,
         "model_name": SPACY_MODEL,
         "model_version": getattr(nlp, "meta", {}).get("version", "?"),
     }
+    meta["pipeline"] = nlp.pipe_names
+    timings["spacy_model"].update(
+        model=SPACY_MODEL, model_version=meta["model_version"], spacy_version=spacy.__version__, pipeline=nlp.pipe_names
+    )
 
-    # wordbank
-    t0 = time.perf_counter()
-    wordbank = load_pickle(WORDBANK_PKL)
-    t1 = time.perf_counter()
-    print(f"Loaded wordbank.pkl with {len(wordbank)} entries in {t1 - t0:.4f} seconds")
+    if use_compiled:
+        stale = [p for p in (WORDBANK_PKL, LEMMA_PKL, POS_CATEGORIES_PKL)
+                 if os.path.isfile(p) and os.path.getmtime(p) > os.path.getmtime(COMPILED_LEXICON)]
+        if stale:
+            logger.warning(f"{COMPILED_LEXICON} is older than {stale}; rerun create_compiled_lexicon.py")
 
-    # lemma data
-    t0 = time.perf_counter()
-    lemma_tuple = load_pickle(LEMMA_PKL)
-    if not (isinstance(lemma_tuple, tuple) and len(lemma_tuple) == 2):
-        raise ValueError("lemma_data.pkl must be a (lemma_forms, form_to_lemma) tuple")
-    lemma_forms, form_to_lemma = lemma_tuple
-    t1 = time.perf_counter()
-    print(
-        f"Loaded lemma_data.pkl with {len(lemma_forms)} lemmas "
-        f"and {len(form_to_lemma)} forms in {t1 - t0:.4f} seconds"
-    )
+    meta["lexicon_version"] = lexicon_fingerprint(lexicon_paths + [PRONOUNS_PKL, CONNECTIVES_PKL])
 
-    # pronouns
-    t0 = time.perf_counter()
-    pronouns = load_pickle(PRONOUNS_PKL)
-    t1 = time.perf_counter()
-    print(f"Loaded pronouns.pkl with {len(pronouns['all_pronouns'])} pronouns in {t1 - t0:.4f} seconds")
-
-    # connectives
-    t0 = time.perf_counter()
-    connectives = load_pickle(CONNECTIVES_PKL)
-    t1 = time.perf_counter()
-    print(f"Loaded connectives.pkl with {len(connectives['all_connectives'])} connectives in {t1 - t0:.4f} seconds")
-
-    # pos categories
-    t0 = time.perf_counter()
-    pos_categories = load_pickle(POS_CATEGORIES_PKL)
-    t1 = time.perf_counter()
-    print(f"Loaded pos_categories.pkl with {len(pos_categories['content_words'])} content words in {t1 - t0:.4f} seconds")
-
-    return nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, meta
+    # lexicon index
+    lexicon_index = timed("lexicon_index", build_lexicon_index, pronouns, connectives, pos_categories)
+    timings["lexicon_index"]["entries"] = len(lexicon_index.masks)
+
+    for name, timing in timings.items():
+        log_event("resource_loaded", resource=name, **timing)
+    timings["total"] = {"seconds": round(time.perf_counter() - t_start, 4)}
+    log_event("resources_ready", seconds=timings["total"]["seconds"])
+
+    return (nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, lexicon_index, meta), timings
+
+
+def init_resources() -> Tuple[Language, Any, dict, dict, dict, dict, dict, LexiconIndex, dict]:
+    """
+    Load all resources (see load_resources) and return only the resource tuple:
+        (nlp, wordbank, lemma_forms, form_to_lemma, pronouns, connectives, pos_categories, lexicon_index, meta)
+    """
+    return load_resources()[0]
@@ -0,0 +1,159 @@
+# File: text-analysis/result_cache.py
+# Part of: text-analysis project
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+CACHE_MAX_ENTRIES = int(os.getenv("METRICS_CACHE_MAX_ENTRIES", "4096"))
+CACHE_TTL_SECONDS = float(os.getenv("METRICS_CACHE_TTL_SECONDS", "86400"))
+CACHE_DB_PATH = os.getenv("METRICS_CACHE_DB_PATH", "")  # empty: memory tier only
+
+# purge expired rows from the disk tier every N writes
+_DISK_PURGE_EVERY = 500
+
+
+def cache_version_key(meta: dict, metrics_version: str, profile: Optional[str] = None) -> str:
+    """
+    Everything besides the text that changes a result: spaCy/model versions,
+    lexicon versions (all in `meta`), the metric suite version and the
+    pipeline profile (e.g. senter vs parser sentence boundaries).
+    """
+    return json.dumps({"meta": meta, "metrics_version": metrics_version, "profile": profile}, sort_keys=True)
+
+
+class ResultCache:
+    """
+    Content-addressed cache for per-text metric results.
+    Keys are sha256(version_key + variant + text); the variant separates
+    results for metric subsets from the full suite (""). Tiers:
+      - memory: LRU with max_entries and ttl_seconds eviction
+      - disk (optional): SQLite file, same TTL, hits are promoted to memory
+    Thread-safe; used from the thread pool.
+    """
+
+    def __init__(self, version_key: str, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = CACHE_TTL_SECONDS, db_path: Optional[str] = CACHE_DB_PATH):
+        self.version_key = version_key
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+
+        self._memory: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if self.db_path:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS text_metrics "
+                "(key TEXT PRIMARY KEY, created REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def key(self, text: str, variant: str = "") -> str:
+        digest = hashlib.sha256()
+        digest.update(self.version_key.encode("utf-8"))
+        digest.update(b"\0")
+        if variant:
+            digest.update(variant.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, text: str, variant: str = "") -> Optional[dict]:
+        key = self.key(text, variant)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, value FROM text_metrics WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[0] <= self.ttl_seconds:
+                    value = json.loads(row[1])
+                    self._remember(key, row[0], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, value: dict, variant: str = "") -> None:
+        key = self.key(text, variant)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO text_metrics (key, created, value) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(value)),
+                )
+                self._disk_writes += 1
+                if self._disk_writes % _DISK_PURGE_EVERY == 0:
+                    self._db.execute("DELETE FROM text_metrics WHERE created < ?", (now - self.ttl_seconds,))
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, value: dict) -> None:
+        # caller holds the lock
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def split(self, texts: List[str], variant: str = "") -> Tuple[List[Optional[dict]], List[int]]:
+        """
+        Look up a batch of texts.
+        Returns (results with None for misses, indices of the misses).
+        """
+        results = [self.get(text, variant) for text in texts]
+        missing = [i for i, result in enumerate(results) if result is None]
+        return results, missing
+
+    def fill(self, texts: List[str], results: List[Optional[dict]], missing: List[int], computed: List[dict],
+             variant: str = "") -> List[dict]:
+        # store freshly computed results and slot them into the batch
+        for i, value in zip(missing, computed):
+            results[i] = value
+            self.put(texts[i], value, variant)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_enabled": self._db is not None,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
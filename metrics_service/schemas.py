@@ -2,7 +2,7 @@
 # Part of: text-analysis project
 
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 # --- Input schemas ---
@@ -18,7 +18,22 @@ class StudentIn(BaseModel):
 
 
 class SubmissionIn(BaseModel):
+    """
+    Input: students (List[StudentIn]), metrics (optional List[str])
+    Output: BaseModel
+    metrics selects groups (e.g. "readability") or single metrics; all metrics when omitted
+    """
     students: List[StudentIn]
+    metrics: Optional[List[str]] = None
+
+
+class MetricsJobIn(SubmissionIn):
+    """
+    Input: students (List[StudentIn]), metrics (optional List[str]), callback_url (optional str)
+    Output: BaseModel
+    callback_url receives a POST with the job status when the job finishes
+    """
+    callback_url: Optional[str] = None
 
 
 # --- Output schemas ---
@@ -50,3 +65,20 @@ class SubmissionOut(BaseModel):
     """
     status: str
     result: MetricsResultOut
+
+
+class JobStatusOut(BaseModel):
+    """
+    Input: job_id (str), status (str), done (int), total (int), created_at (float),
+           started_at (optional float), finished_at (optional float), error (optional str)
+    Output: BaseModel
+    status is one of queued, running, done, failed; done/total count texts
+    """
+    job_id: str
+    status: str
+    done: int
+    total: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
@@ -0,0 +1,110 @@
+# File: text-analysis/worker_pool.py
+# Part of: text-analysis project
+
+import os
+import math
+import time
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from resources import init_resources, configure_logging, log_event, SPACY_BATCH_SIZE
+from analysis.orchestrate_text_metrics import iter_text_metrics
+
+
+METRICS_WORKERS = int(os.getenv("METRICS_WORKERS", "1"))
+METRICS_CHUNK_SIZE = int(os.getenv("METRICS_CHUNK_SIZE", "16"))
+METRICS_POOL_STARTUP_TIMEOUT = float(os.getenv("METRICS_POOL_STARTUP_TIMEOUT", "300"))
+
+# resources loaded once per worker process by the pool initializer
+_worker_resources = None
+
+
+def _init_worker() -> None:
+    global _worker_resources
+    configure_logging()
+    _worker_resources = init_resources()
+
+
+def _warmup() -> int:
+    # short sleep so one fast worker cannot answer every warmup task
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def _compute_chunk(texts: List[str], batch_size: int, profile: Optional[str] = "auto", metrics=None) -> List[dict]:
+    # runs inside a worker: batched parse + metric suite (or subset) for one chunk
+    return list(iter_text_metrics(texts, _worker_resources, batch_size=batch_size, profile=profile, metrics=metrics))
+
+
+def start_worker_pool(workers: int = METRICS_WORKERS) -> ProcessPoolExecutor:
+    """
+    Start a process pool where every worker loads init_resources() once.
+    Blocks until the workers are up so the first request does not pay the load.
+    """
+    t0 = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+    # one task per worker makes the executor spawn all of them now; repeat
+    # until every worker has finished its initializer and answered
+    pids = set()
+    deadline = t0 + METRICS_POOL_STARTUP_TIMEOUT
+    while len(pids) < workers and time.perf_counter() < deadline:
+        pids |= {f.result() for f in [pool.submit(_warmup) for _ in range(workers)]}
+    log_event("worker_pool_ready", workers=workers, warmed_up=len(pids), seconds=round(time.perf_counter() - t0, 4))
+    return pool
+
+
+async def compute_texts_in_pool(pool: ProcessPoolExecutor, texts: List[str], workers: int = METRICS_WORKERS, batch_size: int = SPACY_BATCH_SIZE, profile: Optional[str] = "auto", metrics=None) -> List[dict]:
+    """
+    Spread texts across the pool in chunks and return their metrics in input order.
+    """
+    if not texts:
+        return []
+
+    chunk_size = max(1, min(METRICS_CHUNK_SIZE, math.ceil(len(texts) / workers)))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, _compute_chunk, chunk, batch_size, profile, metrics) for chunk in chunks
+    ))
+    return [text_metrics for chunk_result in results for text_metrics in chunk_result]
+
+
+def iter_texts_in_pool(pool: ProcessPoolExecutor, texts: List[str], workers: int = METRICS_WORKERS, batch_size: int = SPACY_BATCH_SIZE, profile: Optional[str] = "auto", metrics=None,
+                       chunk_size: Optional[int] = None):
+    """
+    Blocking variant for worker threads: yield metrics in input order as each
+    chunk finishes. At most 2 * workers chunks are in flight; the next one is
+    submitted as a finished chunk is consumed, so finished results do not pile
+    up ahead of a slow consumer. Streams pass a small chunk_size so the first
+    result only waits for one chunk. Chunks not yet started are cancelled if
+    the consumer stops early (e.g. a dropped stream).
+    """
+    if chunk_size is None:
+        chunk_size = max(1, min(METRICS_CHUNK_SIZE, math.ceil(len(texts) / workers))) if texts else 1
+    chunk_size = max(1, chunk_size)
+    starts = iter(range(0, len(texts), chunk_size))
+    in_flight = deque()
+
+    def submit_next() -> None:
+        start = next(starts, None)
+        if start is not None:
+            in_flight.append(pool.submit(_compute_chunk, texts[start:start + chunk_size], batch_size, profile, metrics))
+
+    try:
+        for _ in range(2 * workers):
+            submit_next()
+        while in_flight:
+            chunk_result = in_flight.popleft().result()
+            submit_next()
+            yield from chunk_result
+    finally:
+        for future in in_flight:
+            future.cancel()
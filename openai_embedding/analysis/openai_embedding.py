@@ -1,34 +1,137 @@
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
-from sklearn.metrics.pairwise import cosine_similarity
+import time
+import random
+import asyncio
+from typing import Dict, List, Optional
+
 import numpy as np
-import json
+import openai
+from openai import AsyncAzureOpenAI
+from dotenv import load_dotenv
 
 load_dotenv()
 
-client = AzureOpenAI(
+# the client's own retries are off; embed_batch retries with the shared rate-limit pause below
+client = AsyncAzureOpenAI(
     api_key=os.getenv("AZURE_OPENAI_KEY"),
     api_version="2024-02-01",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    max_retries=0,
 )
 
 deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 
+# inputs per embeddings.create call (provider limit: 2048), and a rough size budget per call
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "2048"))
+EMBEDDING_MAX_BATCH_CHARS = int(os.getenv("EMBEDDING_MAX_BATCH_CHARS", "400000"))
+# concurrent embeddings.create calls per process
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+EMBEDDING_RETRY_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_RETRY_BACKOFF_SECONDS", "1.0"))
+
+# errors worth retrying: throttling, timeouts, dropped connections, provider 5xx
+_RETRY_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+_semaphore: Optional[asyncio.Semaphore] = None
+# monotonic time until which no call is sent, pushed forward by 429 responses
+_paused_until = 0.0
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # created on first use, inside the running event loop
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
 
-def create_embedding(text: str) -> list:
-    response = client.embeddings.create(
-        model=deployment,
-        input=text
-    )
-    return response.data[0].embedding
+async def embed_batch(texts: List[str]) -> List[list]:
+    """
+    One embeddings.create call for up to EMBEDDING_BATCH_SIZE texts, at most
+    EMBEDDING_MAX_CONCURRENCY at a time. A 429 pauses every caller for the
+    provider's Retry-After (or the backoff), not just the one that was throttled.
+    """
+    global _paused_until
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        async with _get_semaphore():
+            delay = _paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                response = await client.embeddings.create(model=deployment, input=texts)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except _RETRY_ERRORS as e:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                wait = _retry_after(e) or EMBEDDING_RETRY_BACKOFF_SECONDS * 2 ** attempt * (1 + random.random() / 2)
+                if isinstance(e, openai.RateLimitError):
+                    _paused_until = max(_paused_until, time.monotonic() + wait)
+                print(f"Embedding call with {len(texts)} inputs failed ({type(e).__name__}), retrying in {wait:.2f}s")
+        await asyncio.sleep(wait)
 
-def get_cosine_similarity(student_text: str, benchmark_text: str) -> float:
-    student_embedding = create_embedding(student_text)
-    benchmark_embedding = create_embedding(benchmark_text)
-    
-    similarity = cosine_similarity([student_embedding], [benchmark_embedding])[0][0]
-    return float(similarity)
+
+def make_batches(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE, max_chars: int = EMBEDDING_MAX_BATCH_CHARS) -> List[List[str]]:
+    # consecutive batches bounded by count and total characters (always at least one text)
+    batches, current, size = [], [], 0
+    for text in texts:
+        if current and (len(current) >= batch_size or size + len(text) > max_chars):
+            batches.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def create_embeddings(texts: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Embeddings for the distinct non-empty texts, keyed by text. Each text is
+    sent once, in batched calls that run concurrently.
+    """
+    unique = list(dict.fromkeys(t for t in texts if t.strip()))
+    batches = make_batches(unique)
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    return {
+        text: np.asarray(embedding, dtype=np.float64)
+        for batch, embeddings in zip(batches, results)
+        for text, embedding in zip(batch, embeddings)
+    }
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(a @ b / denom) if denom > 0 else 0.0
+
+
+async def get_cosine_similarities(student_texts: List[str], benchmark_text: str) -> List[Optional[float]]:
+    """
+    Cosine similarity of every student text to the benchmark. The benchmark
+    and all student texts are embedded together, each distinct text once.
+    Empty texts are not sent (the API rejects them) and get None.
+    """
+    embeddings = await create_embeddings([benchmark_text] + list(student_texts))
+    benchmark_embedding = embeddings.get(benchmark_text)
+    return [
+        cosine(embeddings[text], benchmark_embedding)
+        if benchmark_embedding is not None and text in embeddings else None
+        for text in student_texts
+    ]
+
+
+async def get_cosine_similarity(student_text: str, benchmark_text: str) -> Optional[float]:
+    return (await get_cosine_similarities([student_text], benchmark_text))[0]
 
 """
 def main():
@@ -36,9 +139,9 @@ def main():
     test_benchmark = "Klimaendringer er et stort problem som påvirker hele verden. Isen på Nordpolen og Antarktis smelter mye raskere enn før, og dette fører til at havnivået stiger."
 
 
-    similarity = get_cosine_similarity(test_student, test_benchmark)
+    similarity = asyncio.run(get_cosine_similarity(test_student, test_benchmark))
     print(f"Cosine similarity: {similarity}")
 
 if __name__ == "__main__":
     main()
-"""
\ No newline at end of file
+"""
@@ -1,9 +1,21 @@
+from typing import List
 
-from .openai_embedding import get_cosine_similarity
+from .openai_embedding import get_cosine_similarity, get_cosine_similarities
 
-def return_features(student_text: str, benchmark_text: str):
-    cosine_sim = get_cosine_similarity(student_text, benchmark_text)
+async def return_features(student_text: str, benchmark_text: str):
+    cosine_sim = await get_cosine_similarity(student_text, benchmark_text)
     
     return {
         "openai_cosine_similarity": cosine_sim
-    }
\ No newline at end of file
+    }
+
+async def return_features_batch(student_texts: List[str], benchmark_text: str) -> List[dict]:
+    # features for every text of a request; embeddings are deduplicated and batched
+    cosine_sims = await get_cosine_similarities(student_texts, benchmark_text)
+    
+    return [
+        {
+            "openai_cosine_similarity": cosine_sim
+        }
+        for cosine_sim in cosine_sims
+    ]
\ No newline at end of file
@@ -1,14 +1,22 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from schemas import BenchmarkRequestIn, BenchmarkResultOut, ResultOut, ComparisonOut
-from analysis.orchestrate_features import return_features
+from analysis.orchestrate_features import return_features_batch
+from analysis.openai_embedding import client
 import json
 import time
-from starlette.concurrency import run_in_threadpool
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await client.close()
 
-def process_embedding_request(request: BenchmarkRequestIn) -> BenchmarkResultOut:
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def process_embedding_request(request: BenchmarkRequestIn) -> BenchmarkResultOut:
     request_dict = request.dict()
     
     student_id = request_dict["student_id"]
@@ -16,14 +24,15 @@ def process_embedding_request(request: BenchmarkRequestIn) -> BenchmarkResultOut
     benchmark_text = request_dict["benchmark"]["benchmark_text"]
     texts = request_dict["texts"]
     
+    # one deduplicated, batched embedding pass for the benchmark and every text
+    all_metrics = await return_features_batch([t["text"] for t in texts], benchmark_text)
+    
     comparisons = []
     
-    for text_item in texts:
+    for text_item, benchmark_metrics in zip(texts, all_metrics):
         text_id = text_item["text_id"]
         text_content = text_item["text"]
         
-        benchmark_metrics = return_features(text_content, benchmark_text)
-        
         comparison = {
             "text_id": text_id,
             "text": text_content,
@@ -49,7 +58,7 @@ async def embed_texts(request: BenchmarkRequestIn):
     start_time = time.perf_counter()
     
     try:
-        result = await run_in_threadpool(process_embedding_request, request)
+        result = await process_embedding_request(request)
         elapsed_time = time.perf_counter() - start_time
         print(f"Processed {len(request.texts)} embeddings in {elapsed_time:.4f} seconds")
         return result
@@ -69,7 +78,7 @@ async def embed_mock():
     
     try:
         request = BenchmarkRequestIn(**mock_data)
-        result = await run_in_threadpool(process_embedding_request, request)
+        result = await process_embedding_request(request)
         print(f"Processed mock data with {len(request.texts)} embeddings")
         return result
     except Exception as e:
@@ -0,0 +1,98 @@
+import os
+import asyncio
+import hashlib
+from typing import List, Union
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Local stand-in for the embeddings provider, for load tests without spending tokens:
+#   uvicorn stub_provider:app --port 8005
+#   AZURE_OPENAI_ENDPOINT=http://localhost:8005 AZURE_OPENAI_KEY=stub AZURE_OPENAI_DEPLOYMENT=stub uvicorn app:app --port 8004
+
+STUB_EMBEDDING_DIM = int(os.getenv("STUB_EMBEDDING_DIM", "256"))
+# simulated provider latency per call
+STUB_LATENCY_SECONDS = float(os.getenv("STUB_LATENCY_SECONDS", "0.05"))
+# answer every Nth call with a 429 (0 = never)
+STUB_RATE_LIMIT_EVERY = int(os.getenv("STUB_RATE_LIMIT_EVERY", "0"))
+STUB_RETRY_AFTER_SECONDS = float(os.getenv("STUB_RETRY_AFTER_SECONDS", "0.5"))
+# same limit as the real API
+STUB_MAX_INPUTS = 2048
+
+app = FastAPI()
+
+stats = {"requests": 0, "rate_limited": 0, "inputs": 0, "max_batch": 0}
+
+
+class EmbeddingsIn(BaseModel):
+    input: Union[str, List[str]]
+    model: str = "stub"
+
+
+def fake_embedding(text: str) -> List[float]:
+    # deterministic per text, so equal texts get equal vectors
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(STUB_EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def error(status: int, message: str, headers: dict = None) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {"message": message, "code": str(status)}}, headers=headers)
+
+
+async def create_embeddings(body: EmbeddingsIn):
+    """
+    Input: EmbeddingsIn
+    Output: embeddings response in the provider's format
+    """
+    stats["requests"] += 1
+    number = stats["requests"]
+    await asyncio.sleep(STUB_LATENCY_SECONDS)
+
+    if STUB_RATE_LIMIT_EVERY and number % STUB_RATE_LIMIT_EVERY == 0:
+        stats["rate_limited"] += 1
+        return error(429, "Rate limit reached", {"retry-after": str(STUB_RETRY_AFTER_SECONDS)})
+
+    texts = [body.input] if isinstance(body.input, str) else body.input
+    if not texts or len(texts) > STUB_MAX_INPUTS:
+        return error(400, f"input must hold 1 to {STUB_MAX_INPUTS} items")
+    if any(not text for text in texts):
+        return error(400, "input cannot contain empty strings")
+
+    stats["inputs"] += len(texts)
+    stats["max_batch"] = max(stats["max_batch"], len(texts))
+
+    return {
+        "object": "list",
+        "model": body.model,
+        "data": [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+            for i, text in enumerate(texts)
+        ],
+        "usage": {"prompt_tokens": sum(len(t.split()) for t in texts), "total_tokens": sum(len(t.split()) for t in texts)},
+    }
+
+
+@app.post("/openai/deployments/{deployment}/embeddings")
+async def azure_embeddings(deployment: str, body: EmbeddingsIn):
+    # path used by AzureOpenAI clients
+    return await create_embeddings(body)
+
+
+@app.post("/v1/embeddings")
+async def openai_embeddings(body: EmbeddingsIn):
+    return await create_embeddings(body)
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    for key in stats:
+        stats[key] = 0
+    return stats
@@ -1,22 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from schemas import OrchestratorRequestIn, OrchestratorResponse, OrchestratorResult, BenchmarkOut, TextOut
-import httpx
+from fastapi.responses import StreamingResponse
+from schemas import (
+    OrchestratorRequestIn, OrchestratorResponse, OrchestratorResult, BenchmarkOut, TextOut,
+    OrchestratorBatchRequestIn, OrchestratorBatchResponse, OrchestratorBatchResult, StudentResultOut,
+)
+import service_clients
 import asyncio
 import json
+import time
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # pooled keep-alive clients, shared by every orchestration
+    service_clients.open_clients()
+    yield
+    await service_clients.close_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 async def call_metrics_service(data):
-    async with httpx.AsyncClient() as client:
-        response = await client.post("http://metrics_service:8001/compute", json=data)
-        response.raise_for_status()
-        return response.json()
+    return await service_clients.metrics_client.post_json("/compute", data)
 
 async def call_benchmark_service(data):
-    async with httpx.AsyncClient() as client:
-        response = await client.post("http://benchmark_service:8002/compare", json=data)
-        response.raise_for_status()
-        return response.json()
+    return await service_clients.benchmark_client.post_json("/compare", data)
+
+async def call_benchmark_service_batch(data):
+    return await service_clients.benchmark_client.post_json("/compare-batch", data)
 
 @app.post("/orchestrate", response_model=OrchestratorResponse)
 async def orchestrate(request: OrchestratorRequestIn):
@@ -98,6 +110,181 @@ async def orchestrate(request: OrchestratorRequestIn):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/orchestrate-batch", response_model=OrchestratorBatchResponse)
+async def orchestrate_batch(request: OrchestratorBatchRequestIn):
+    try:
+        students = [
+            {
+                "student_id": student.student_id,
+                "texts": [{"text_id": t.text_id, "text": t.text} for t in student.texts]
+            }
+            for student in request.students
+        ]
+        benchmark = {
+            "benchmark_id": request.benchmark.benchmark_id,
+            "benchmark_text": request.benchmark.benchmark_text
+        }
+
+        # One metrics request for the whole class, benchmark text included once as the first "student"
+        metrics_input = {
+            "students": [
+                {
+                    "student_id": "benchmark",
+                    "texts": [{"text_id": request.benchmark.benchmark_id, "text": request.benchmark.benchmark_text}]
+                }
+            ] + students
+        }
+
+        # One benchmark request for the whole class, so the benchmark is analysed once
+        benchmark_input = {
+            "benchmark": benchmark,
+            "students": students
+        }
+
+        metrics_result, benchmark_result = await asyncio.gather(
+            call_metrics_service(metrics_input),
+            call_benchmark_service_batch(benchmark_input)
+        )
+
+        # Both services answer in request order; match by position so a student
+        # called "benchmark" or repeated text ids cannot be mixed up
+        benchmark_entry, *student_metrics = metrics_result["result"]["students"]
+        benchmark_text_metrics = benchmark_entry["texts"][0]
+
+        students_out = []
+        for student, metrics_student, comparisons_student in zip(
+            request.students, student_metrics, benchmark_result["result"]["students"]
+        ):
+            texts_out = [
+                TextOut(
+                    text_id=comparison["text_id"],
+                    text=comparison["text"],
+                    metrics=text_metrics["metrics"],
+                    scores=text_metrics["scores"],
+                    benchmark_metrics=comparison["benchmark_metrics"]
+                )
+                for text_metrics, comparison in zip(metrics_student["texts"], comparisons_student["comparisons"])
+            ]
+            students_out.append(StudentResultOut(student_id=student.student_id, texts=texts_out))
+
+        result = OrchestratorBatchResult(
+            benchmark=BenchmarkOut(
+                benchmark_id=request.benchmark.benchmark_id,
+                benchmark_text=request.benchmark.benchmark_text,
+                metrics=benchmark_text_metrics["metrics"],
+                scores=benchmark_text_metrics["scores"]
+            ),
+            students=students_out
+        )
+
+        return OrchestratorBatchResponse(status="ok", result=result)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def next_line(lines, service: str) -> dict:
+    # next NDJSON record of an upstream stream; upstream errors become exceptions
+    line = await anext(lines, None)
+    if line is None:
+        raise RuntimeError(f"{service} stream ended early")
+    if line["type"] == "error":
+        raise RuntimeError(f"{service}: {line['detail']}")
+    return line
+
+async def next_lines(metrics_lines, benchmark_lines):
+    # next record of both streams, read concurrently; if one fails the other read is
+    # cancelled and awaited, so neither generator is still running when it is closed
+    tasks = [
+        asyncio.ensure_future(next_line(metrics_lines, "metrics_service")),
+        asyncio.ensure_future(next_line(benchmark_lines, "benchmark_service"))
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return tasks[0].result(), tasks[1].result()
+
+async def iter_orchestration_lines(request: OrchestratorBatchRequestIn):
+    # merges the two upstream NDJSON streams text by text; both follow request order
+    start_time = time.perf_counter()
+    students = [
+        {
+            "student_id": student.student_id,
+            "texts": [{"text_id": t.text_id, "text": t.text} for t in student.texts]
+        }
+        for student in request.students
+    ]
+    metrics_input = {
+        "students": [
+            {
+                "student_id": "benchmark",
+                "texts": [{"text_id": request.benchmark.benchmark_id, "text": request.benchmark.benchmark_text}]
+            }
+        ] + students
+    }
+    benchmark_input = {
+        "benchmark": {
+            "benchmark_id": request.benchmark.benchmark_id,
+            "benchmark_text": request.benchmark.benchmark_text
+        },
+        "students": students
+    }
+    pairs = [(student.student_id, t.text_id) for student in request.students for t in student.texts]
+
+    metrics_lines = service_clients.metrics_client.stream_lines("/compute-stream", metrics_input)
+    benchmark_lines = service_clients.benchmark_client.stream_lines("/compare-stream", benchmark_input)
+    try:
+        # open both streams together; the first metrics line is the benchmark text
+        if pairs:
+            benchmark_line, comparison = await next_lines(metrics_lines, benchmark_lines)
+        else:
+            benchmark_line, comparison = await next_line(metrics_lines, "metrics_service"), None
+        yield json.dumps({
+            "type": "benchmark",
+            "benchmark_id": request.benchmark.benchmark_id,
+            "metrics": benchmark_line["metrics"],
+            "scores": benchmark_line["scores"]
+        }) + "\n"
+
+        for i, (student_id, text_id) in enumerate(pairs):
+            if i == 0:
+                text_line = await next_line(metrics_lines, "metrics_service")
+            else:
+                text_line, comparison = await next_lines(metrics_lines, benchmark_lines)
+            yield json.dumps({
+                "type": "text",
+                "student_id": student_id,
+                "text_id": text_id,
+                "metrics": text_line["metrics"],
+                "scores": text_line["scores"],
+                "benchmark_metrics": comparison["benchmark_metrics"]
+            }) + "\n"
+    except Exception as e:
+        # the status line is already sent, so report the failure in-band
+        yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        return
+    finally:
+        await metrics_lines.aclose()
+        await benchmark_lines.aclose()
+
+    yield json.dumps({
+        "type": "summary",
+        "status": "ok",
+        "students": len(request.students),
+        "texts": len(pairs),
+        "elapsed_time_sec": time.perf_counter() - start_time
+    }) + "\n"
+
+@app.post("/orchestrate-stream")
+async def orchestrate_stream(request: OrchestratorBatchRequestIn):
+    # one NDJSON line for the benchmark, one per text as soon as both services have it, then a summary
+    return StreamingResponse(iter_orchestration_lines(request), media_type="application/x-ndjson")
+
 @app.get("/health")
 async def health():
     return {"status": "healthy", "service": "orchestrator_service"}
@@ -34,4 +34,24 @@ class OrchestratorResult(BaseModel):
 
 class OrchestratorResponse(BaseModel):
     status: str
-    result: OrchestratorResult
\ No newline at end of file
+    result: OrchestratorResult
+
+class StudentTextsIn(BaseModel):
+    student_id: str
+    texts: List[TextIn]
+
+class OrchestratorBatchRequestIn(BaseModel):
+    benchmark: BenchmarkIn
+    students: List[StudentTextsIn]
+
+class StudentResultOut(BaseModel):
+    student_id: str
+    texts: List[TextOut]
+
+class OrchestratorBatchResult(BaseModel):
+    benchmark: BenchmarkOut
+    students: List[StudentResultOut]
+
+class OrchestratorBatchResponse(BaseModel):
+    status: str
+    result: OrchestratorBatchResult
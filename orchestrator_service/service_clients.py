@@ -0,0 +1,127 @@
+# Application-scoped HTTP clients for the downstream services
+
+import os
+import json
+import asyncio
+import importlib.util
+from typing import Optional
+
+import httpx
+
+
+METRICS_SERVICE_URL = os.getenv("METRICS_SERVICE_URL", "http://metrics_service:8001")
+BENCHMARK_SERVICE_URL = os.getenv("BENCHMARK_SERVICE_URL", "http://benchmark_service:8002")
+
+# connection pool, shared by all requests to one service
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# HTTP/2 needs the optional h2 package; without it the clients speak HTTP/1.1
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+# read timeouts (seconds) and retry budgets per service
+METRICS_SERVICE_TIMEOUT = float(os.getenv("METRICS_SERVICE_TIMEOUT", "120"))
+BENCHMARK_SERVICE_TIMEOUT = float(os.getenv("BENCHMARK_SERVICE_TIMEOUT", "120"))
+METRICS_SERVICE_RETRIES = int(os.getenv("METRICS_SERVICE_RETRIES", "2"))
+BENCHMARK_SERVICE_RETRIES = int(os.getenv("BENCHMARK_SERVICE_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("RETRY_BACKOFF_SECONDS", "0.5"))
+
+# only failures where the request never reached a worker are retried: a read
+# timeout or 502/504 can mean the service is still computing the first attempt
+RETRY_STATUS_CODES = {503}
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class ServiceClient:
+    """
+    One long-lived httpx.AsyncClient per downstream service, so connections are
+    reused across orchestrations instead of being set up for every call.
+    Connect errors, connect/pool timeouts and 503 are retried up to `retries`
+    times with exponential backoff; other errors, read timeouts included,
+    are raised right away.
+    """
+
+    def __init__(self, name: str, base_url: str, timeout: float, retries: int):
+        self.name = name
+        self.retries = retries
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT),
+        )
+
+    async def post_json(self, path: str, data: dict) -> dict:
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = await self.client.post(path, json=data)
+            except RETRY_ERRORS as e:
+                if last_attempt:
+                    raise
+                print(f"{self.name} {path} failed ({e!r}), retrying")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    response.raise_for_status()
+                    return response.json()
+                print(f"{self.name} {path} returned {response.status_code}, retrying")
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+    async def stream_lines(self, path: str, data: dict):
+        """
+        POST and yield each NDJSON line of the response as a dict.
+        Only opening the stream is retried; once lines have been read a
+        failure is raised to the caller.
+        """
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                request = self.client.build_request("POST", path, json=data)
+                response = await self.client.send(request, stream=True)
+            except RETRY_ERRORS as e:
+                if last_attempt:
+                    raise
+                print(f"{self.name} {path} failed ({e!r}), retrying")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    break
+                await response.aclose()
+                print(f"{self.name} {path} returned {response.status_code}, retrying")
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+        try:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)
+        finally:
+            await response.aclose()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+metrics_client: Optional[ServiceClient] = None
+benchmark_client: Optional[ServiceClient] = None
+
+
+def open_clients() -> None:
+    global metrics_client, benchmark_client
+    metrics_client = ServiceClient("metrics_service", METRICS_SERVICE_URL, METRICS_SERVICE_TIMEOUT, METRICS_SERVICE_RETRIES)
+    benchmark_client = ServiceClient("benchmark_service", BENCHMARK_SERVICE_URL, BENCHMARK_SERVICE_TIMEOUT, BENCHMARK_SERVICE_RETRIES)
+
+
+async def close_clients() -> None:
+    global metrics_client, benchmark_client
+    for client in (metrics_client, benchmark_client):
+        if client is not None:
+            await client.close()
+    metrics_client = None
+    benchmark_client = None